@@ -1,8 +1,6 @@
-import requests
-import base64
-import wave
-import numpy as np
-from pydub import AudioSegment
+import http_client
+from audio_core import normalize_to_pcm16, pcm16_to_wav_base64, wav_to_base64
+from worker_pool import run_blocking
 from dotenv import load_dotenv
 import os
 load_dotenv()
@@ -24,50 +22,38 @@ def prepare_audio_base64(audio_path: str) -> str:
         Exception: If audio loading or conversion fails.
     """
     try:
-        audio = AudioSegment.from_wav(audio_path)
-
-        # Ensure correct format: mono, 16-bit, 16 kHz
-        audio = (
-            audio.set_channels(1)
-                 .set_sample_width(2)
-                 .set_frame_rate(16000)
-        )
-
-        pcm_data = np.array(audio.get_array_of_samples())
-
-        # Save as proper raw PCM WAV temporarily
-        tmp_output = "processed_pcm.wav"
-        with wave.open(tmp_output, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)
-            wf.setframerate(16000)
-            wf.writeframes(pcm_data.tobytes())
-
-        with open(tmp_output, "rb") as wf:
-            audio_bytes = wf.read()
-
-        return base64.b64encode(audio_bytes).decode("utf-8")
+        # Already-normalized files pass straight through; everything else is
+        # downmixed/resampled in NumPy and assembled in memory, so concurrent
+        # calls never share a temp file.
+        return wav_to_base64(audio_path)
 
     except Exception as e:
         raise Exception(f"Audio processing failed: {e}")
 
 
-def hamsa_stt(audio_path: str, language: str = "ar") -> dict:
+def prepare_audio_pcm(audio_path: str):
     """
-    Perform speech-to-text using the Hamsa STT API.
+    Load a WAV file and normalize it to 16-kHz mono 16-bit PCM samples.
 
     Args:
-        audio_path (str): Local WAV file to transcribe (any format; will be normalized).
-        language (str): Language code for recognition (e.g., 'ar').
+        audio_path (str): Path to the input WAV file.
 
     Returns:
-        dict: Transcription result from the API.
+        np.ndarray: 1-D int16 samples.
 
     Raises:
-        Exception: If API call fails or invalid response received.
+        Exception: If audio loading or conversion fails.
     """
-    audio_b64 = prepare_audio_base64(audio_path)
+    try:
+        with open(audio_path, "rb") as f:
+            return normalize_to_pcm16(f.read())
 
+    except Exception as e:
+        raise Exception(f"Audio processing failed: {e}")
+
+
+def _stt_request(audio_b64: str, language: str) -> dict:
+    """Build the keyword arguments for a Hamsa STT POST."""
     payload = {
         "audioBase64": audio_b64,
         "language": language,
@@ -80,9 +66,71 @@ def hamsa_stt(audio_path: str, language: str = "ar") -> dict:
         "Content-Type": "application/json"
     }
 
-    response = requests.post(HAMSA_STT_URL, json=payload, headers=headers)
+    return {"json": payload, "headers": headers}
 
+
+def _stt_result(response) -> dict:
     if response.status_code == 200:
         return response.json()
     else:
         raise Exception(f"Hamsa STT Error {response.status_code}: {response.text[:200]}")
+
+
+def hamsa_stt(audio_path: str, language: str = "ar") -> dict:
+    """
+    Perform speech-to-text using the Hamsa STT API.
+
+    Args:
+        audio_path (str): Local WAV file to transcribe (any format; will be normalized).
+        language (str): Language code for recognition (e.g., 'ar').
+
+    Returns:
+        dict: Transcription result from the API.
+
+    Raises:
+        Exception: If API call fails or invalid response received.
+    """
+    audio_b64 = prepare_audio_base64(audio_path)
+    response = http_client.post(HAMSA_STT_URL, **_stt_request(audio_b64, language))
+    return _stt_result(response)
+
+
+async def hamsa_stt_async(audio_path: str, language: str = "ar") -> dict:
+    """
+    Async version of `hamsa_stt`.
+
+    Audio normalization runs on the bounded worker pool and the upload uses
+    the pooled async HTTP client, so the event loop is never blocked.
+
+    Args:
+        audio_path (str): Local WAV file to transcribe (any format; will be normalized).
+        language (str): Language code for recognition (e.g., 'ar').
+
+    Returns:
+        dict: Transcription result from the API.
+
+    Raises:
+        Exception: If API call fails or invalid response received.
+    """
+    audio_b64 = await run_blocking(prepare_audio_base64, audio_path)
+    response = await http_client.apost(HAMSA_STT_URL, **_stt_request(audio_b64, language))
+    return _stt_result(response)
+
+
+async def hamsa_stt_pcm_async(pcm, language: str = "ar") -> dict:
+    """
+    Transcribe already-normalized 16-kHz mono PCM with the Hamsa STT API.
+
+    Args:
+        pcm: 1-D int16 samples (see `prepare_audio_pcm`).
+        language (str): Language code for recognition (e.g., 'ar').
+
+    Returns:
+        dict: Transcription result from the API.
+
+    Raises:
+        Exception: If API call fails or invalid response received.
+    """
+    audio_b64 = await run_blocking(pcm16_to_wav_base64, pcm)
+    response = await http_client.apost(HAMSA_STT_URL, **_stt_request(audio_b64, language))
+    return _stt_result(response)
@@ -54,3 +54,25 @@ def generate_content_sync(prompt: str, model_instance=None) -> str:
         The complete response text
     """
     return generate_content(prompt, stream=False, model_instance=model_instance)
+
+
+async def generate_content_async(prompt: str, stream: bool = False, model_instance=None):
+    """
+    Generate content without blocking the event loop.
+    
+    Args:
+        prompt: The prompt to send to the model
+        stream: Whether to stream the response (default: False)
+        model_instance: Optional model instance to use. If None, uses the default model.
+    
+    Returns:
+        If stream=False: The complete response text
+        If stream=True: Async iterable of response chunks
+    """
+    model_to_use = model_instance if model_instance is not None else model
+    response = await model_to_use.generate_content_async(prompt, stream=stream)
+    
+    if stream:
+        return response
+    else:
+        return response.text
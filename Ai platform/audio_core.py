@@ -0,0 +1,483 @@
+import base64
+import functools
+import struct
+from collections import namedtuple
+import numpy as np
+
+TARGET_RATE = 16000
+TARGET_CHANNELS = 1
+TARGET_SAMPWIDTH = 2
+WAV_HEADER_SIZE = 44
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+WavInfo = namedtuple("WavInfo", "format_tag channels samplerate sampwidth data_offset data_size")
+
+
+# -----------------------------
+# WAV container
+# -----------------------------
+def write_wav_header(buf, num_frames: int, samplerate: int = TARGET_RATE,
+                     channels: int = TARGET_CHANNELS, sampwidth: int = TARGET_SAMPWIDTH) -> None:
+    """
+    Write a canonical 44-byte PCM WAV header into the start of `buf`.
+
+    Args:
+        buf: Writable buffer (e.g. bytearray) at least 44 bytes long.
+        num_frames (int): Number of audio frames that follow the header.
+        samplerate (int): Sample rate in Hz.
+        channels (int): Number of interleaved channels.
+        sampwidth (int): Bytes per sample.
+    """
+    block_align = channels * sampwidth
+    data_size = num_frames * block_align
+    struct.pack_into(
+        "<4sI4s4sIHHIIHH4sI", buf, 0,
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, samplerate, samplerate * block_align, block_align, sampwidth * 8,
+        b"data", data_size
+    )
+
+
+def parse_wav_header(data) -> WavInfo:
+    """
+    Sniff a RIFF/WAVE header without touching the sample payload.
+
+    Args:
+        data: Bytes-like object holding (at least the start of) a WAV file.
+
+    Returns:
+        WavInfo: Format tag, channel count, sample rate, sample width and
+                 the offset/size of the `data` chunk.
+
+    Raises:
+        ValueError: If the buffer is not a WAV file, has no data chunk, or
+            ends before the fmt chunk or the data chunk's header (a stream
+            cut anywhere in its header parses once more bytes arrive).
+    """
+    mv = memoryview(data)
+    if len(mv) < 12 or bytes(mv[0:4]) != b"RIFF" or bytes(mv[8:12]) != b"WAVE":
+        raise ValueError("not a RIFF/WAVE file")
+
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(mv):
+        chunk_id = bytes(mv[pos:pos + 4])
+        chunk_size = struct.unpack_from("<I", mv, pos + 4)[0]
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            if chunk_size < 16:
+                raise ValueError("WAV fmt chunk is too short")
+            if len(mv) < body + min(chunk_size, 26):
+                raise ValueError("WAV fmt chunk is truncated")
+            format_tag, channels, samplerate, _, _, bits = struct.unpack_from("<HHIIHH", mv, body)
+            if format_tag == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40:
+                # The real format tag is the first two bytes of the SubFormat GUID.
+                format_tag = struct.unpack_from("<H", mv, body + 24)[0]
+            fmt = (format_tag, channels, samplerate, bits // 8)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk precedes fmt chunk")
+            # Streamed WAVs often carry a bogus size; trust the buffer instead.
+            data_size = min(chunk_size, len(mv) - body)
+            return WavInfo(*fmt, body, data_size)
+        pos = body + chunk_size + (chunk_size & 1)
+    raise ValueError("WAV file has no data chunk")
+
+
+def decode_wav(data):
+    """
+    Decode a WAV buffer into float32 frames in [-1, 1).
+
+    Args:
+        data: Bytes-like object holding a complete WAV file.
+
+    Returns:
+        tuple[WavInfo, np.ndarray]: Header info and a (frames, channels) float32 array.
+
+    Raises:
+        ValueError: If the sample format is not supported.
+    """
+    info = parse_wav_header(data)
+    frame_bytes = info.channels * info.sampwidth
+    usable = info.data_size - info.data_size % frame_bytes
+    raw = np.frombuffer(data, dtype=np.uint8, count=usable, offset=info.data_offset)
+    samples = _to_float32(raw, info.format_tag, info.sampwidth)
+    return info, samples.reshape(-1, info.channels)
+
+
+def decode_wav_mono(data):
+    """
+    Decode a WAV buffer straight to mono float32, downmixing on the fly.
+
+    Common integer/float formats are summed channel by channel from a typed
+    view of the payload, so the full multichannel clip is never materialized
+    as float32.
+
+    Args:
+        data: Bytes-like object holding a complete WAV file.
+
+    Returns:
+        tuple[WavInfo, np.ndarray]: Header info and a 1-D float32 array in [-1, 1).
+    """
+    info = parse_wav_header(data)
+    typed = _NATIVE_DTYPES.get((info.format_tag, info.sampwidth))
+    if typed is None:
+        _, frames = decode_wav(data)
+        return info, downmix(frames)
+
+    dtype, scale = typed
+    frames = info.data_size // (info.channels * info.sampwidth)
+    view = np.frombuffer(data, dtype=dtype, count=frames * info.channels,
+                         offset=info.data_offset).reshape(-1, info.channels)
+    mono = view[:, 0].astype(np.float32)
+    for ch in range(1, info.channels):
+        mono += view[:, ch]
+    mono *= scale / info.channels
+    return info, mono
+
+
+_NATIVE_DTYPES = {
+    (WAVE_FORMAT_PCM, 2): ("<i2", 1.0 / 32768),
+    (WAVE_FORMAT_PCM, 4): ("<i4", 1.0 / 2147483648),
+    (WAVE_FORMAT_IEEE_FLOAT, 4): ("<f4", 1.0),
+}
+
+
+def _to_float32(raw: np.ndarray, format_tag: int, sampwidth: int) -> np.ndarray:
+    """Bit-depth conversion from little-endian WAV samples to float32."""
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        if sampwidth == 4:
+            return raw.view("<f4").astype(np.float32)
+        if sampwidth == 8:
+            return raw.view("<f8").astype(np.float32)
+    elif format_tag == WAVE_FORMAT_PCM:
+        if sampwidth == 1:
+            return (raw.astype(np.float32) - 128.0) * (1.0 / 128)
+        if sampwidth == 2:
+            return raw.view("<i2").astype(np.float32) * (1.0 / 32768)
+        if sampwidth == 3:
+            b = raw.reshape(-1, 3).astype(np.int32)
+            # Assemble into the top 24 bits so the sign is carried for free.
+            packed = (b[:, 0] << 8) | (b[:, 1] << 16) | (b[:, 2] << 24)
+            return packed.astype(np.float32) * (1.0 / 2147483648)
+        if sampwidth == 4:
+            return raw.view("<i4").astype(np.float32) * (1.0 / 2147483648)
+    raise ValueError(f"unsupported WAV sample format (tag={format_tag}, width={sampwidth})")
+
+
+def pcm16_to_wav_buffer(pcm, samplerate: int = TARGET_RATE) -> bytearray:
+    """
+    Pack mono 16-bit PCM samples into a single preallocated WAV buffer.
+
+    The header and payload share one allocation; the samples are copied
+    exactly once, straight into their final position.
+
+    Args:
+        pcm: 1-D array-like of int16 samples.
+        samplerate (int): Sample rate of `pcm` in Hz.
+
+    Returns:
+        bytearray: Complete WAV file contents.
+    """
+    pcm = np.asarray(pcm)
+    num_frames = pcm.shape[0]
+    buf = bytearray(WAV_HEADER_SIZE + num_frames * TARGET_SAMPWIDTH)
+    write_wav_header(buf, num_frames, samplerate)
+    if num_frames:
+        np.frombuffer(buf, dtype="<i2", offset=WAV_HEADER_SIZE)[:] = pcm
+    return buf
+
+
+def pcm16_to_wav_base64(pcm, samplerate: int = TARGET_RATE) -> str:
+    """
+    Build an in-memory WAV from mono 16-bit PCM and return it Base64-encoded.
+
+    Args:
+        pcm: 1-D array-like of int16 samples.
+        samplerate (int): Sample rate of `pcm` in Hz.
+
+    Returns:
+        str: Base64-encoded WAV file.
+    """
+    return base64.b64encode(pcm16_to_wav_buffer(pcm, samplerate)).decode("ascii")
+
+
+def sniff_audio_format(data, mulaw: bool = False) -> dict:
+    """
+    Identify the container of an audio payload from its first bytes.
+
+    Args:
+        data: Audio bytes (e.g. a TTS response body).
+        mulaw (bool): Whether headerless data should be reported as µ-law.
+
+    Returns:
+        dict: {"format": "wav" | "mp3" | "ogg" | "mulaw" | "unknown",
+               "sample_rate": int or None, "channels": int or None}
+    """
+    head = bytes(data[:4])
+    if head == b"RIFF":
+        try:
+            info = parse_wav_header(data)
+            return {"format": "wav", "sample_rate": info.samplerate, "channels": info.channels}
+        except ValueError:
+            pass
+    elif head[:3] == b"ID3" or (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return {"format": "mp3", "sample_rate": None, "channels": None}
+    elif head == b"OggS":
+        return {"format": "ogg", "sample_rate": None, "channels": None}
+    elif mulaw:
+        return {"format": "mulaw", "sample_rate": 8000, "channels": 1}
+    return {"format": "unknown", "sample_rate": None, "channels": None}
+
+
+# -----------------------------
+# DSP
+# -----------------------------
+def downmix(frames: np.ndarray) -> np.ndarray:
+    """Average a (frames, channels) array down to mono."""
+    if frames.ndim == 1:
+        return frames
+    if frames.shape[1] == 1:
+        return frames[:, 0]
+    return frames.mean(axis=1, dtype=np.float32)
+
+
+def float_to_pcm16(samples: np.ndarray) -> np.ndarray:
+    """Round and saturate float32 samples in [-1, 1) to int16."""
+    out = np.multiply(samples, 32768.0, dtype=np.float32)
+    np.rint(out, out=out)
+    np.clip(out, -32768, 32767, out=out)
+    return out.astype("<i2")
+
+
+@functools.lru_cache(maxsize=16)
+def _polyphase_filter(up: int, down: int, zero_crossings: int):
+    """
+    Design the Kaiser-windowed sinc anti-aliasing filter for an up/down
+    ratio and split it into `up` polyphase branches.
+
+    Returns:
+        tuple: (up x taps float32 matrix of time-reversed branches, taps per branch, filter delay)
+    """
+    half_len = zero_crossings * max(up, down)
+    n = 2 * half_len + 1
+    cutoff = 1.0 / max(up, down)
+    h = cutoff * np.sinc(cutoff * (np.arange(n) - half_len)) * np.kaiser(n, 5.0) * up
+    taps = -(-n // up)
+    h = np.concatenate([h, np.zeros(taps * up - n)])
+    branches = h.reshape(taps, up)[::-1].T
+    return np.ascontiguousarray(branches, dtype=np.float32), taps, half_len
+
+
+def resample_poly(x: np.ndarray, up: int, down: int, zero_crossings: int = 10,
+                  block: int = 1 << 18) -> np.ndarray:
+    """
+    Rational-ratio polyphase resampler (upsample by `up`, low-pass, decimate by `down`).
+
+    Only the output samples are ever computed. Outputs that share a filter
+    phase read the input at a fixed stride, so each phase is a single
+    matrix-vector product over a strided window view of the input. Output
+    is produced in blocks, each reading a small zero-padded slice of the
+    input, so peak memory stays flat for long clips.
+
+    Args:
+        x (np.ndarray): 1-D float32 signal.
+        up (int): Interpolation factor.
+        down (int): Decimation factor.
+        zero_crossings (int): Filter half-length in zero crossings of the sinc.
+        block (int): Approximate number of output samples computed per block.
+
+    Returns:
+        np.ndarray: Resampled float32 signal of length ceil(len(x) * up / down).
+    """
+    g = np.gcd(up, down)
+    up, down = int(up // g), int(down // g)
+    x = np.asarray(x, dtype=np.float32)
+    if up == down:
+        return x
+
+    branches, taps, delay = _polyphase_filter(up, down, zero_crossings)
+    n_out = -(-len(x) * up // down)
+    step = up * max(1, block // up)  # keep every block phase-aligned
+
+    y = np.empty(n_out, dtype=np.float32)
+    for m0 in range(0, n_out, step):
+        m1 = min(m0 + step, n_out)
+        lo = (m0 * down + delay) // up - (taps - 1)
+        hi = ((m1 - 1) * down + delay) // up + 1
+        seg = np.zeros(hi - lo, dtype=np.float32)
+        a, b = max(lo, 0), min(hi, len(x))
+        if a < b:
+            seg[a - lo:b - lo] = x[a:b]
+        windows = np.lib.stride_tricks.sliding_window_view(seg, taps)
+
+        for m in range(m0, min(m0 + up, m1)):
+            t0 = m * down + delay
+            first = t0 // up - (taps - 1) - lo
+            count = len(range(m, m1, up))
+            rows = windows[first:first + (count - 1) * down + 1:down]
+            y[m:m + (count - 1) * up + 1:up] = rows @ branches[t0 % up]
+    return y
+
+
+def crossfade_concat(clips: list, samplerate: int = TARGET_RATE, crossfade_ms: float = 15) -> np.ndarray:
+    """
+    Join mono int16 clips with a short raised-cosine crossfade at each join.
+
+    The output is allocated once; each join overlaps the tail of one clip
+    with the head of the next (shortened for clips shorter than the fade).
+
+    Args:
+        clips (list[np.ndarray]): 1-D int16 clips in order.
+        samplerate (int): Sample rate of the clips in Hz.
+        crossfade_ms (float): Overlap at each join.
+
+    Returns:
+        np.ndarray: 1-D int16 samples.
+    """
+    clips = [np.asarray(c) for c in clips if len(c)]
+    if not clips:
+        return np.zeros(0, dtype="<i2")
+    fade = int(samplerate * crossfade_ms / 1000)
+    overlaps = [min(fade, len(a) // 2, len(b) // 2) for a, b in zip(clips, clips[1:])]
+    out = np.zeros(sum(len(c) for c in clips) - sum(overlaps), dtype=np.float32)
+
+    pos = 0
+    for i, clip in enumerate(clips):
+        head = overlaps[i - 1] if i else 0
+        if head:
+            # Gains sum to 1, so matching material at the join is not boosted.
+            rise = np.square(np.sin(0.5 * np.pi * (np.arange(head, dtype=np.float32) + 0.5) / head))
+            out[pos:pos + head] += (clip[:head] - out[pos:pos + head]) * rise
+        out[pos + head:pos + len(clip)] = clip[head:]
+        pos += len(clip) - (overlaps[i] if i < len(overlaps) else 0)
+    np.clip(out, -32768, 32767, out=out)
+    return out.astype("<i2")
+
+
+# -----------------------------
+# STT normalization
+# -----------------------------
+def decode_range_mono(data, info: WavInfo, start: int, stop: int) -> np.ndarray:
+    """
+    Decode frames [start, stop) of a WAV payload to mono float32.
+
+    Only that slice of the payload is read, so this works on a memory-mapped
+    file of any length with memory proportional to the range.
+
+    Args:
+        data: Bytes-like object (e.g. an mmap) holding the WAV file.
+        info (WavInfo): Header info from `parse_wav_header(data)`.
+        start (int): First frame, in source frames.
+        stop (int): One past the last frame.
+
+    Returns:
+        np.ndarray: 1-D float32 array in [-1, 1).
+    """
+    frame_bytes = info.channels * info.sampwidth
+    stop = min(stop, info.data_size // frame_bytes)
+    count = max(0, stop - start)
+    offset = info.data_offset + start * frame_bytes
+    typed = _NATIVE_DTYPES.get((info.format_tag, info.sampwidth))
+    if typed is None:
+        raw = np.frombuffer(data, dtype=np.uint8, count=count * frame_bytes, offset=offset)
+        return downmix(_to_float32(raw, info.format_tag, info.sampwidth).reshape(-1, info.channels))
+
+    dtype, scale = typed
+    view = np.frombuffer(data, dtype=dtype, count=count * info.channels,
+                         offset=offset).reshape(-1, info.channels)
+    mono = view[:, 0].astype(np.float32)
+    for ch in range(1, info.channels):
+        mono += view[:, ch]
+    mono *= scale / info.channels
+    return mono
+
+
+def is_target_format(info: WavInfo, samplerate: int = TARGET_RATE) -> bool:
+    """True if the WAV is already mono 16-bit PCM at `samplerate`."""
+    return (info.format_tag == WAVE_FORMAT_PCM and info.channels == 1
+            and info.sampwidth == 2 and info.samplerate == samplerate)
+
+
+def normalize_to_pcm16(data, samplerate: int = TARGET_RATE) -> np.ndarray:
+    """
+    Convert any supported WAV buffer into mono 16-bit PCM at `samplerate`.
+
+    Inputs that are already in the target format are returned as a
+    zero-copy view of the original buffer.
+
+    Args:
+        data: Bytes-like object holding a complete WAV file.
+        samplerate (int): Output sample rate in Hz.
+
+    Returns:
+        np.ndarray: 1-D int16 samples.
+    """
+    info = parse_wav_header(data)
+    if is_target_format(info, samplerate):
+        count = info.data_size // 2
+        return np.frombuffer(data, dtype="<i2", count=count, offset=info.data_offset)
+
+    _, mono = decode_wav_mono(data)
+    if info.samplerate != samplerate:
+        mono = resample_poly(mono, samplerate, info.samplerate)
+    return float_to_pcm16(mono)
+
+
+def normalize_range_to_pcm16(data, info: WavInfo, start: int, stop: int,
+                             samplerate: int = TARGET_RATE) -> np.ndarray:
+    """
+    Convert frames [start, stop) of a WAV payload into mono 16-bit PCM at `samplerate`.
+
+    Unlike `normalize_to_pcm16`, the result never aliases `data`, so the
+    source (typically an mmap) can be closed while the samples are in use.
+
+    Args:
+        data: Bytes-like object holding the WAV file.
+        info (WavInfo): Header info from `parse_wav_header(data)`.
+        start (int): First frame, in source frames.
+        stop (int): One past the last frame.
+        samplerate (int): Output sample rate in Hz.
+
+    Returns:
+        np.ndarray: 1-D int16 samples.
+    """
+    if is_target_format(info, samplerate):
+        stop = min(stop, info.data_size // 2)
+        count = max(0, stop - start)
+        return np.frombuffer(data, dtype="<i2", count=count, offset=info.data_offset + start * 2).copy()
+
+    mono = decode_range_mono(data, info, start, stop)
+    if info.samplerate != samplerate:
+        mono = resample_poly(mono, samplerate, info.samplerate)
+    return float_to_pcm16(mono)
+
+
+def wav_to_base64(source, samplerate: int = TARGET_RATE) -> str:
+    """
+    Normalize a WAV (path or bytes) to 16-kHz mono PCM and return it Base64-encoded.
+
+    A canonical 16-kHz mono 16-bit file is passed through byte-for-byte
+    without decoding.
+
+    Args:
+        source (str | bytes): Path to a WAV file, or the file contents.
+        samplerate (int): Output sample rate in Hz.
+
+    Returns:
+        str: Base64-encoded WAV file.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = source
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+
+    info = parse_wav_header(data)
+    if (is_target_format(info, samplerate) and info.data_offset == WAV_HEADER_SIZE
+            and info.data_offset + info.data_size == len(data)):
+        return base64.b64encode(data).decode("ascii")
+    return pcm16_to_wav_base64(normalize_to_pcm16(data, samplerate), samplerate)
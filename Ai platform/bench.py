@@ -0,0 +1,452 @@
+"""
+Micro-benchmarks for the audio and API paths used by the MCP server.
+
+Run from this directory, e.g.:
+
+    python bench.py prepare --seconds 30 --requests 64 --workers 8
+    python bench.py resample --seconds 60
+    python bench.py concurrency --calls 12 --latency 0.5
+    python bench.py coalesce --calls 20 --latency 0.5
+    python bench.py longform --minutes 30 --parallelism 8
+    python bench.py tts-long --sentences 4 16 64
+    python bench.py batch --items 200 --concurrency 1 8 32 --failure-rate 0.05
+    python bench.py upload --seconds 120 --chunk-ms 200
+"""
+import argparse
+import asyncio
+import base64
+import os
+import tempfile
+import time
+import tracemalloc
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import numpy as np
+from pydub import AudioSegment
+
+from ASR import prepare_audio_base64
+from audio_core import normalize_to_pcm16, pcm16_to_wav_buffer
+from cache import AudioBlobStore, TTSCache, TranscriptCache
+
+
+def make_test_wav(path: str, seconds: float, samplerate: int = 44100, channels: int = 2,
+                  sampwidth: int = 2) -> None:
+    """Write a synthetic tone + noise WAV used as benchmark input."""
+    t = np.arange(int(seconds * samplerate)) / samplerate
+    tone = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * np.random.randn(t.size)
+    tone = np.clip(tone, -1, 1)
+    if sampwidth == 1:
+        samples = (tone * 127 + 128).astype(np.uint8)
+    else:
+        samples = (tone * 32767).astype("<i2")
+    frames = np.repeat(samples[:, None], channels, axis=1)
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sampwidth)
+        wf.setframerate(samplerate)
+        wf.writeframes(frames.tobytes())
+
+
+def legacy_prepare_audio_base64(audio_path: str, tmp_output: str = "processed_pcm.wav") -> str:
+    """The original disk round-trip implementation, kept for comparison."""
+    audio = AudioSegment.from_wav(audio_path)
+    audio = audio.set_channels(1).set_sample_width(2).set_frame_rate(16000)
+    pcm_data = np.array(audio.get_array_of_samples())
+    with wave.open(tmp_output, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(16000)
+        wf.writeframes(pcm_data.tobytes())
+    with open(tmp_output, "rb") as wf:
+        audio_bytes = wf.read()
+    return base64.b64encode(audio_bytes).decode("utf-8")
+
+
+def _throughput(fn, path: str, requests: int, workers: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda _: fn(path), range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+def bench_prepare(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "input.wav")
+        make_test_wav(src, args.seconds)
+        legacy_tmp = os.path.join(tmp, "processed_pcm.wav")
+
+        def legacy(path):
+            return legacy_prepare_audio_base64(path, legacy_tmp)
+
+        for name, fn in (("legacy (disk)", legacy), ("in-memory", prepare_audio_base64)):
+            rate = _throughput(fn, src, args.requests, args.workers)
+            print(f"{name:>16}: {rate:8.2f} req/s  ({args.seconds:.0f}s clip, {args.workers} workers)")
+
+
+def pydub_normalize(path: str) -> np.ndarray:
+    """The original pydub chain used by every STT entry point."""
+    audio = AudioSegment.from_wav(path)
+    audio = audio.set_channels(1).set_sample_width(2).set_frame_rate(16000)
+    return np.array(audio.get_array_of_samples())
+
+
+def numpy_normalize(path: str) -> np.ndarray:
+    with open(path, "rb") as f:
+        return normalize_to_pcm16(f.read())
+
+
+def _measure(fn, path: str, repeat: int):
+    """Return (CPU seconds per call, peak traced bytes) for fn(path)."""
+    fn(path)  # warm filter caches / imports
+    tracemalloc.start()
+    cpu = time.process_time()
+    for _ in range(repeat):
+        fn(path)
+    cpu = (time.process_time() - cpu) / repeat
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak
+
+
+def bench_resample(args) -> None:
+    formats = [
+        ("44.1k stereo 16-bit", 44100, 2, 2),
+        ("48k stereo 16-bit", 48000, 2, 2),
+        ("8k mono 8-bit", 8000, 1, 1),
+        ("16k mono 16-bit", 16000, 1, 2),
+    ]
+    minutes = args.seconds / 60
+    print(f"{'input':>20} | {'engine':>6} | {'CPU s / audio min':>17} | {'peak MiB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, rate, channels, width in formats:
+            src = os.path.join(tmp, "input.wav")
+            make_test_wav(src, args.seconds, rate, channels, width)
+            for engine, fn in (("pydub", pydub_normalize), ("numpy", numpy_normalize)):
+                cpu, peak = _measure(fn, src, args.repeat)
+                print(f"{label:>20} | {engine:>6} | {cpu / minutes:17.3f} | {peak / 2**20:8.1f}")
+
+
+def _simulated_server(tmp: str, latency):
+    """
+    Import the MCP server with Hamsa/Gemini replaced by sleep-based fakes
+    and caches pointed at `tmp`. `latency()` gives each upstream call's delay.
+
+    Returns:
+        tuple: (server module, list that records one entry per upstream call)
+    """
+    import http_client
+    import server
+
+    upstream = []
+
+    async def fake_apost(url, **kwargs):
+        upstream.append(url)
+        await asyncio.sleep(latency())
+        if url.endswith("/stt"):
+            return httpx.Response(200, json={"text": "مرحبا"})
+        return httpx.Response(200, content=b"\0" * 32000)
+
+    async def fake_generate(prompt, stream=False, model_instance=None):
+        upstream.append("llm")
+        await asyncio.sleep(latency())
+        return f"echo: {prompt}"
+
+    http_client.apost = fake_apost
+    server.generate_content_async = fake_generate
+    server.tts_cache = TTSCache(directory=os.path.join(tmp, "tts-cache"))
+    server.stt_cache = TranscriptCache(directory=os.path.join(tmp, "stt-cache"))
+    server.audio_blobs = AudioBlobStore(directory=os.path.join(tmp, "blobs"))
+    return server, upstream
+
+
+def bench_concurrency(args) -> None:
+    """
+    Fire N simultaneous distinct llm/tts/stt tool calls against simulated
+    upstreams and check the batch finishes in ~max(latency), not sum(latency).
+    """
+    latencies = [args.latency * (1 + i % 3) / 2 for i in range(args.calls)]
+    pending = iter(latencies)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server, _ = _simulated_server(tmp, lambda: next(pending))
+        calls = []
+        for i in range(args.calls):
+            kind = i % 3
+            if kind == 0:
+                calls.append(server.llm_tool(f"prompt {i}"))
+            elif kind == 1:
+                calls.append(server.tts_tool(f"نص {i}"))
+            else:
+                src = os.path.join(tmp, f"input{i}.wav")
+                make_test_wav(src, 10)
+                calls.append(server.stt_tool(src))
+
+        async def run():
+            start = time.perf_counter()
+            await asyncio.gather(*calls)
+            return time.perf_counter() - start
+
+        wall = asyncio.run(run())
+
+    worst, total = max(latencies), sum(latencies)
+    verdict = "PASS" if wall < worst * 1.5 else "FAIL"
+    print(f"{args.calls} calls: wall {wall:.2f}s | max latency {worst:.2f}s | sum {total:.2f}s -> {verdict}")
+
+
+def bench_coalesce(args) -> None:
+    """Fire N identical calls per tool at once and count upstream requests."""
+    with tempfile.TemporaryDirectory() as tmp:
+        server, upstream = _simulated_server(tmp, lambda: args.latency)
+        src = os.path.join(tmp, "input.wav")
+        make_test_wav(src, 10)
+
+        async def run():
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                call
+                for _ in range(args.calls)
+                for call in (server.llm_tool("same prompt"), server.tts_tool("أهلا وسهلا"), server.stt_tool(src))
+            ))
+            return time.perf_counter() - start
+
+        wall = asyncio.run(run())
+        print(f"{3 * args.calls} calls -> {len(upstream)} upstream requests in {wall:.2f}s")
+        for name, stats in server.cache_stats()["coalescing"].items():
+            print(f"  {name}: {stats}")
+
+
+def make_speech_like_wav(path: str, seconds: float, samplerate: int = 16000) -> None:
+    """Write tone bursts separated by short near-silent pauses (for silence splitting)."""
+    rng = np.random.default_rng(0)
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(samplerate)
+        written = 0
+        while written < seconds * samplerate:
+            n = int(samplerate * rng.uniform(2, 8))
+            burst = 0.3 * np.sin(2 * np.pi * 220 * np.arange(n) / samplerate) + 0.02 * rng.standard_normal(n)
+            pause = 0.002 * rng.standard_normal(int(samplerate * rng.uniform(0.3, 1.0)))
+            chunk = np.concatenate([burst, pause])
+            wf.writeframes((np.clip(chunk, -1, 1) * 32767).astype("<i2").tobytes())
+            written += len(chunk)
+
+
+def bench_longform(args) -> None:
+    """Single-request vs silence-split parallel stt_tool on a long recording."""
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "long.wav")
+        make_speech_like_wav(src, args.minutes * 60)
+        # Simulated STT time grows with the audio sent (payload is Base64 WAV).
+        server, upstream = _simulated_server(tmp, lambda: 0.0)
+        import http_client
+        fake_apost = http_client.apost
+
+        async def sized_apost(url, **kwargs):
+            audio_s = len(kwargs["json"]["audioBase64"]) * 3 / 4 / 32000
+            await asyncio.sleep(args.rtf * audio_s)
+            return await fake_apost(url, **kwargs)
+
+        http_client.apost = sized_apost
+
+        async def run(**kwargs):
+            server.stt_cache = TranscriptCache(directory=os.path.join(tmp, f"stt-{len(upstream)}"))
+            tracemalloc.start()
+            start = time.perf_counter()
+            result = await server.stt_tool(src, **kwargs)
+            wall = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return wall, peak, result
+
+        for label, kwargs in (("single request", {}),
+                              ("long-form", {"long_form": True, "parallelism": args.parallelism})):
+            calls = len(upstream)
+            wall, peak, _ = asyncio.run(run(**kwargs))
+            print(f"{label:>15}: {wall:6.2f}s wall | {len(upstream) - calls:3d} requests "
+                  f"| peak {peak / 2**20:7.1f} MiB ({args.minutes:.0f} min audio)")
+
+
+def bench_tts_long(args) -> None:
+    """Single-request vs chunked parallel tts_tool for texts of increasing length."""
+    # Numbered so no two chunks coalesce or hit the cache.
+    sentence = "الرسالة رقم {}: مرحبا بكم في خدمة العملاء، نحن سعداء بخدمتكم اليوم. "
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server, upstream = _simulated_server(tmp, lambda: 0.0)
+        import http_client
+
+        async def sized_apost(url, **kwargs):
+            # Simulated synthesis: fixed overhead plus time and audio proportional to the text.
+            chars = len(kwargs["json"]["text"])
+            upstream.append(url)
+            await asyncio.sleep(args.overhead + args.per_char * chars)
+            pcm = (0.1 * np.sin(np.arange(chars * 1000) / 8) * 32767).astype("<i2")
+            return httpx.Response(200, content=bytes(pcm16_to_wav_buffer(pcm)))
+
+        http_client.apost = sized_apost
+
+        print(f"{'chars':>6} | {'requests':>8} | {'single s':>8} | {'parallel s':>10} | {'speedup':>7}")
+        for n in args.sentences:
+            text = "".join(sentence.format(i) for i in range(n))
+            server.tts_cache = TTSCache(directory=os.path.join(tmp, f"tts-{n}-single"))
+            start = time.perf_counter()
+            asyncio.run(server.tts_tool(text))
+            single = time.perf_counter() - start
+
+            server.tts_cache = TTSCache(directory=os.path.join(tmp, f"tts-{n}-long"))
+            calls = len(upstream)
+            start = time.perf_counter()
+            asyncio.run(server.tts_tool(text, long_text=True))
+            parallel = time.perf_counter() - start
+            print(f"{len(text):6d} | {len(upstream) - calls:8d} | {single:8.2f} | {parallel:10.2f} "
+                  f"| {single / parallel:6.1f}x")
+
+
+def bench_batch(args) -> None:
+    """stt_batch_tool / tts_batch_tool throughput by concurrency, with injected upstream failures."""
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server, upstream = _simulated_server(tmp, lambda: args.latency)
+        server.BATCH_RETRY_BACKOFF = 0.01
+        import http_client
+        fake_apost = http_client.apost
+
+        async def flaky_apost(url, **kwargs):
+            if rng.random() < args.failure_rate:
+                await asyncio.sleep(args.latency)
+                return httpx.Response(503, text="simulated overload")
+            return await fake_apost(url, **kwargs)
+
+        http_client.apost = flaky_apost
+        for i in range(args.items):
+            make_test_wav(os.path.join(tmp, f"item{i:04d}.wav"), 1, 16000, 1)
+
+        print(f"{'tool':>14} | {'conc':>4} | {'items/s':>8} | {'failed':>6} | {'retries':>7}")
+        for concurrency in args.concurrency:
+            server.stt_cache = TranscriptCache(directory=os.path.join(tmp, f"stt-{concurrency}"))
+            server.tts_cache = TTSCache(directory=os.path.join(tmp, f"tts-{concurrency}"))
+            stt = asyncio.run(server.stt_batch_tool(pattern=os.path.join(tmp, "item*.wav"),
+                                                    concurrency=concurrency))
+            tts = asyncio.run(server.tts_batch_tool([f"نص رقم {i}" for i in range(args.items)],
+                                                    concurrency=concurrency))
+            for name, summary in (("stt_batch_tool", stt), ("tts_batch_tool", tts)):
+                print(f"{name:>14} | {concurrency:4d} | {summary['items_per_s']:8.1f} "
+                      f"| {summary['failed']:6d} | {summary['retries']:7d}")
+
+
+def bench_upload(args) -> None:
+    """Latency after the last chunk: stt_upload_* sessions vs uploading first, then stt_tool."""
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "upload.wav")
+        make_speech_like_wav(src, args.seconds)
+        with open(src, "rb") as f:
+            data = f.read()
+        server, upstream = _simulated_server(tmp, lambda: 0.0)
+        import http_client
+        fake_apost = http_client.apost
+
+        async def sized_apost(url, **kwargs):
+            audio_s = len(kwargs["json"]["audioBase64"]) * 3 / 4 / 32000
+            await asyncio.sleep(args.overhead + args.rtf * audio_s)
+            return await fake_apost(url, **kwargs)
+
+        http_client.apost = sized_apost
+        chunk = 32000 * args.chunk_ms // 1000
+
+        async def upload(offsets, resend=False):
+            """Upload `data` cut at `offsets`; with `resend`, every chunk is sent twice (a client retry)."""
+            session = (await server.stt_upload_begin())["session_id"]
+            for seq, (a, b) in enumerate(zip(offsets, offsets[1:] + [len(data)])):
+                part = base64.b64encode(data[a:b]).decode()
+                for _ in range(2 if resend else 1):
+                    await server.stt_upload_append(session, part, seq)
+                # Chunks arrive in real time, scaled by --speedup to keep the run short.
+                await asyncio.sleep((b - a) / 32000 / args.speedup)
+            start = time.perf_counter()
+            result = await server.stt_upload_finish(session)
+            return result, time.perf_counter() - start
+
+        async def run():
+            result, streamed = await upload(list(range(0, len(data), chunk)))
+
+            start = time.perf_counter()
+            await server.stt_tool(src)
+            whole = time.perf_counter() - start
+
+            # Same audio with the header and first samples cut at every byte, each chunk resent.
+            split, _ = await upload(list(range(args.byte_split)) + list(range(args.byte_split, len(data), chunk)),
+                                    resend=True)
+            same = [(s["start"], s["end"]) for s in split["raw_response"]["segments"]] == \
+                   [(s["start"], s["end"]) for s in result["raw_response"]["segments"]]
+            return streamed, whole, len(result["raw_response"]["segments"]), same
+
+        streamed, whole, segments, same = asyncio.run(run())
+        print(f"{args.seconds:.0f}s audio in {args.chunk_ms} ms chunks: upload session {streamed * 1000:.0f} ms "
+              f"after last chunk ({segments} segments) | stt_tool on the full file {whole * 1000:.0f} ms")
+        print(f"first {args.byte_split} bytes in 1-byte chunks, every chunk sent twice: "
+              f"{'same segments' if same else 'DIFFERENT segments'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("prepare", help="ASR.prepare_audio_base64 throughput")
+    p.add_argument("--seconds", type=float, default=30.0)
+    p.add_argument("--requests", type=int, default=64)
+    p.add_argument("--workers", type=int, default=8)
+    p.set_defaults(func=bench_prepare)
+
+    p = sub.add_parser("resample", help="pydub vs NumPy normalization CPU time and peak memory")
+    p.add_argument("--seconds", type=float, default=60.0)
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_resample)
+
+    p = sub.add_parser("concurrency", help="simultaneous MCP tool calls vs simulated upstream latency")
+    p.add_argument("--calls", type=int, default=12)
+    p.add_argument("--latency", type=float, default=0.5)
+    p.set_defaults(func=bench_concurrency)
+
+    p = sub.add_parser("coalesce", help="identical concurrent tool calls vs upstream requests")
+    p.add_argument("--calls", type=int, default=20)
+    p.add_argument("--latency", type=float, default=0.5)
+    p.set_defaults(func=bench_coalesce)
+
+    p = sub.add_parser("longform", help="single-request vs silence-split parallel STT")
+    p.add_argument("--minutes", type=float, default=30.0)
+    p.add_argument("--parallelism", type=int, default=8)
+    p.add_argument("--rtf", type=float, default=0.05, help="simulated STT seconds per audio second")
+    p.set_defaults(func=bench_longform)
+
+    p = sub.add_parser("tts-long", help="single-request vs chunked parallel TTS by text length")
+    p.add_argument("--sentences", type=int, nargs="+", default=[2, 8, 32, 64])
+    p.add_argument("--overhead", type=float, default=0.2, help="simulated seconds per request")
+    p.add_argument("--per-char", type=float, default=0.002, help="simulated seconds per character")
+    p.set_defaults(func=bench_tts_long)
+
+    p = sub.add_parser("batch", help="batch tool throughput by concurrency with injected failures")
+    p.add_argument("--items", type=int, default=200)
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    p.add_argument("--latency", type=float, default=0.1)
+    p.add_argument("--failure-rate", type=float, default=0.05)
+    p.set_defaults(func=bench_batch)
+
+    p = sub.add_parser("upload", help="latency after the last chunk, upload session vs whole file")
+    p.add_argument("--seconds", type=float, default=120.0)
+    p.add_argument("--chunk-ms", type=int, default=200)
+    p.add_argument("--speedup", type=float, default=20.0, help="chunks arrive this much faster than real time")
+    p.add_argument("--overhead", type=float, default=0.2, help="simulated seconds per request")
+    p.add_argument("--rtf", type=float, default=0.05, help="simulated STT seconds per audio second")
+    p.add_argument("--byte-split", type=int, default=128, help="leading bytes sent one per chunk")
+    p.set_defaults(func=bench_upload)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,539 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from audio_core import parse_wav_header, sniff_audio_format
+from worker_pool import run_blocking
+
+load_dotenv()
+
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(64 * 2**20)))
+TTS_CACHE_DISK_BYTES = int(os.getenv("TTS_CACHE_DISK_BYTES", str(512 * 2**20)))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(".cache", "tts"))
+
+STT_CACHE_BYTES = int(os.getenv("STT_CACHE_BYTES", str(64 * 2**20)))
+STT_CACHE_TTL = float(os.getenv("STT_CACHE_TTL", str(7 * 24 * 3600)))
+STT_CACHE_DIR = os.getenv("STT_CACHE_DIR", os.path.join(".cache", "stt"))
+
+AUDIO_BLOB_MEMORY_BYTES = int(os.getenv("AUDIO_BLOB_MEMORY_BYTES", str(64 * 2**20)))
+AUDIO_BLOB_DISK_BYTES = int(os.getenv("AUDIO_BLOB_DISK_BYTES", str(512 * 2**20)))
+AUDIO_BLOB_TTL = float(os.getenv("AUDIO_BLOB_TTL", "3600"))
+AUDIO_BLOB_DIR = os.getenv("AUDIO_BLOB_DIR", os.path.join(".cache", "blobs"))
+
+# Arabic harakat, tanween, shadda, sukun, maddah/hamza marks and superscript alef.
+_ARABIC_DIACRITICS = re.compile("[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]")
+_TATWEEL = "\u0640"
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonicalize text for cache lookups.
+
+    Strips Arabic diacritics and tatweel and collapses whitespace, so
+    "مرحــباً  بكم" and "مرحبا بكم" map to the same entry.
+    """
+    text = _ARABIC_DIACRITICS.sub("", text).replace(_TATWEEL, "")
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def content_key(*parts) -> str:
+    """SHA-256 over the given parts, used as a content address."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class MemoryLRU:
+    """
+    In-memory LRU of bytes values bounded by total size rather than count,
+    with optional expiry: entries stored more than `ttl` seconds ago read
+    as missing and are dropped.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float = None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.evictions = 0
+        self._items = OrderedDict()  # key -> (value, stored_at), least recent first
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, stored_at = item
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._items[key]
+                self.size -= len(value)
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: bytes, stored_at: float = None) -> None:
+        """Store `value`; `stored_at` (default now) is when its TTL started."""
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self._items[key] = (value, time.time() if stored_at is None else stored_at)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self._items.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is not None:
+                self.size -= len(item[0])
+
+    def __len__(self):
+        return len(self._items)
+
+
+class DiskCache:
+    """
+    Content-addressed file store bounded by total size, evicting least
+    recently used entries, with optional expiry.
+
+    Recency is tracked in memory (write order after a restart); file mtimes
+    record when an entry was written and drive the TTL.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl: float = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()  # key -> (size, written_at), least recent first
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _expired(self, written_at: float) -> bool:
+        return self.ttl is not None and time.time() - written_at > self.ttl
+
+    def _load(self) -> None:
+        found = []
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.is_file() and not entry.name.startswith("."):
+                    st = entry.stat()
+                    found.append((st.st_mtime, entry.name, st.st_size))
+        for written_at, key, size in sorted(found):
+            if self._expired(written_at):
+                self._remove_file(key)
+                self.expirations += 1
+                continue
+            self._entries[key] = (size, written_at)
+            self.size += size
+        self._evict()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[1]):
+                self._drop(key)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.size -= self._entries.pop(key, (0, 0))[0]
+            return None
+
+    def stat(self, key: str):
+        """(size, written_at) of a live entry, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or self._expired(entry[1]):
+            return None
+        return entry
+
+    def read_range(self, key: str, offset: int, length: int = None):
+        """Read `length` bytes (to the end if None) at `offset` without loading the whole entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[1]):
+                self._drop(key)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+        try:
+            with open(self._path(key), "rb") as f:
+                f.seek(offset)
+                return f.read(-1 if length is None else length)
+        except FileNotFoundError:
+            with self._lock:
+                self.size -= self._entries.pop(key, (0, 0))[0]
+            return None
+
+    def put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename so readers never see a partial file.
+        fd, tmp = tempfile.mkstemp(prefix=".", dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(value)
+        os.replace(tmp, path)
+        with self._lock:
+            self.size -= self._entries.pop(key, (0, 0))[0]
+            self._entries[key] = (len(value), time.time())
+            self.size += len(value)
+            self._evict()
+
+    def _drop(self, key: str) -> None:
+        size, _ = self._entries.pop(key)
+        self.size -= size
+        self._remove_file(key)
+
+    def _remove_file(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        while self.size > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TwoTierCache:
+    """
+    Memory LRU in front of a disk store; disk hits are promoted to memory.
+    """
+
+    def __init__(self, memory: MemoryLRU, disk: DiskCache):
+        self.memory = memory
+        self.disk = disk
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get_memory(self, key: str):
+        value = self.memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+        return value
+
+    def get_disk(self, key: str):
+        value = self.disk.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.disk_hits += 1
+            self.memory.put(key, value)
+        return value
+
+    def get(self, key: str):
+        value = self.get_memory(key)
+        return value if value is not None else self.get_disk(key)
+
+    def put(self, key: str, value: bytes) -> None:
+        self.memory.put(key, value)
+        self.disk.put(key, value)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_evictions": self.memory.evictions,
+            "disk_evictions": self.disk.evictions,
+            "disk_expirations": self.disk.expirations,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.size,
+            "disk_entries": len(self.disk),
+            "disk_bytes": self.disk.size,
+        }
+
+
+class AudioBlobStore(TwoTierCache):
+    """
+    Content-addressed store for generated audio served by URI.
+
+    Blobs live in memory and on disk and expire `ttl` seconds after they
+    were last stored. Reads can be ranged; disk ranges are read straight
+    from the file.
+    """
+
+    URI_PREFIX = "audio://tts/"
+    MIME_TYPES = {"wav": "audio/wav", "mp3": "audio/mpeg", "ogg": "audio/ogg", "mulaw": "audio/basic"}
+
+    def __init__(self, memory_bytes: int = AUDIO_BLOB_MEMORY_BYTES, disk_bytes: int = AUDIO_BLOB_DISK_BYTES,
+                 ttl: float = AUDIO_BLOB_TTL, directory: str = AUDIO_BLOB_DIR):
+        super().__init__(MemoryLRU(memory_bytes, ttl), DiskCache(directory, disk_bytes, ttl))
+        self.ttl = ttl
+
+    @classmethod
+    def uri(cls, blob_id: str) -> str:
+        return cls.URI_PREFIX + blob_id
+
+    @classmethod
+    def blob_id(cls, uri: str) -> str:
+        if not uri.startswith(cls.URI_PREFIX):
+            raise ValueError(f"not an audio blob URI: {uri!r}")
+        return uri[len(cls.URI_PREFIX):].split("/", 1)[0]
+
+    def put_audio(self, audio: bytes, mulaw: bool = False) -> dict:
+        """Store `audio` (refreshing its TTL if already present) and return its description."""
+        blob_id = content_key("blob", hashlib.sha256(audio).hexdigest())[:32]
+        self.put(blob_id, audio)
+        return self.describe(blob_id, audio, mulaw)
+
+    def get_disk(self, key: str):
+        entry = self.disk.stat(key)
+        value = self.disk.get(key) if entry is not None else None
+        if value is None:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self.memory.put(key, value, stored_at=entry[1])  # promoted copy expires with the file
+        return value
+
+    def read(self, blob_id: str, offset: int = 0, length: int = None):
+        """
+        Bytes [offset, offset + length) of a blob (to the end if `length` is None).
+
+        Returns:
+            bytes or None: None if the blob does not exist or has expired.
+        """
+        if offset < 0 or (length is not None and length < 0):
+            raise ValueError("offset and length must not be negative")
+        audio = self.get_memory(blob_id)
+        if audio is not None:
+            return audio[offset:] if length is None else audio[offset:offset + length]
+        if offset == 0 and length is None:
+            return self.get_disk(blob_id)
+        value = self.disk.read_range(blob_id, offset, length)
+        if value is None:
+            self.misses += 1
+        else:
+            self.disk_hits += 1
+        return value
+
+    def size_of(self, blob_id: str):
+        audio = self.memory.get(blob_id)
+        if audio is not None:
+            return len(audio)
+        entry = self.disk.stat(blob_id)
+        return entry[0] if entry is not None else None
+
+    def describe(self, blob_id: str, head: bytes = None, mulaw: bool = False) -> dict:
+        """
+        URI and metadata of a blob: size, format, sample rate, channels,
+        duration (WAV only) and seconds until it expires.
+
+        Raises:
+            KeyError: If the blob does not exist or has expired.
+        """
+        size = self.size_of(blob_id)
+        if head is None:
+            head = self.read(blob_id, 0, 64 * 1024)
+        if size is None or head is None:
+            raise KeyError(f"unknown or expired audio blob {blob_id!r}")
+        meta = sniff_audio_format(head, mulaw)
+        duration = None
+        if meta["format"] == "wav":
+            info = parse_wav_header(head)
+            frames = (size - info.data_offset) // (info.channels * info.sampwidth)
+            duration = round(frames / info.samplerate, 3)
+        elif meta["format"] == "mulaw":
+            duration = round(size / 8000, 3)
+        # Memory copies share the file's timestamp, so the disk entry has the expiry.
+        stored_at = (self.disk.stat(blob_id) or (0, time.time()))[1]
+        return {
+            "uri": self.uri(blob_id),
+            "size_bytes": size,
+            **meta,
+            "mime_type": self.MIME_TYPES.get(meta["format"], "application/octet-stream"),
+            "duration_s": duration,
+            "expires_in_s": max(0, round(stored_at + self.ttl - time.time())),
+        }
+
+
+class TTSCache(TwoTierCache):
+    """
+    Synthesized-audio cache keyed on normalized text, speaker, dialect and mulaw.
+    """
+
+    def __init__(self, memory_bytes: int = TTS_CACHE_MEMORY_BYTES,
+                 disk_bytes: int = TTS_CACHE_DISK_BYTES, directory: str = TTS_CACHE_DIR):
+        super().__init__(MemoryLRU(memory_bytes), DiskCache(directory, disk_bytes))
+
+    @staticmethod
+    def key(text: str, speaker: str, dialect: str, mulaw: bool) -> str:
+        return content_key("tts", normalize_text(text), speaker, dialect, bool(mulaw))
+
+    async def get_or_synthesize(self, text: str, speaker: str, dialect: str, mulaw: bool,
+                                synthesize) -> bytes:
+        """
+        Return cached audio, or synthesize it and store it in both tiers.
+
+        Args:
+            text, speaker, dialect, mulaw: TTS request parameters.
+            synthesize: Async callable (text, speaker, dialect, mulaw) -> bytes.
+
+        Returns:
+            bytes: Audio bytes.
+        """
+        key = self.key(text, speaker, dialect, mulaw)
+        # Memory hits are served inline; disk I/O goes to the worker pool.
+        audio = self.get_memory(key)
+        if audio is None:
+            audio = await run_blocking(self.get_disk, key)
+        if audio is None:
+            audio = await synthesize(text, speaker, dialect, mulaw)
+            await run_blocking(self.put, key, audio)
+            logging.info(f"TTS cache store {key[:12]} ({len(audio)} bytes)")
+        return audio
+
+
+class TranscriptCache:
+    """
+    Persistent STT result cache keyed on a hash of the normalized PCM plus
+    language.
+
+    A second, cheaper key built from (path, size, mtime) points at the
+    content key, so unchanged files are answered without being read or
+    decoded at all.
+    """
+
+    def __init__(self, max_bytes: int = STT_CACHE_BYTES, ttl: float = STT_CACHE_TTL,
+                 directory: str = STT_CACHE_DIR):
+        self.store = DiskCache(directory, max_bytes, ttl)
+        self.stat_hits = 0
+        self.content_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def stat_key(audio_path: str, language: str) -> str:
+        st = os.stat(audio_path)
+        return content_key("stt-stat", os.path.abspath(audio_path), st.st_size, st.st_mtime_ns, language)
+
+    @staticmethod
+    def audio_key(pcm, language: str) -> str:
+        return content_key("stt", hashlib.sha256(memoryview(pcm).cast("B")).hexdigest(), language)
+
+    def _get_json(self, key: str):
+        value = self.store.get(key)
+        return json.loads(value) if value is not None else None
+
+    async def transcribe(self, audio_path: str, language: str, load_pcm, transcribe_pcm) -> dict:
+        """
+        Return a cached transcript, or transcribe the audio and remember it.
+
+        Args:
+            audio_path (str): Local WAV file.
+            language (str): Recognition language; part of the key.
+            load_pcm: Callable (path) -> normalized int16 PCM, run on the worker pool.
+            transcribe_pcm: Async callable (pcm, language) -> API result dict.
+
+        Returns:
+            dict: API result.
+        """
+        stat_key = await run_blocking(self.stat_key, audio_path, language)
+        ref = await run_blocking(self.store.get, stat_key)
+        if ref is not None:
+            result = await run_blocking(self._get_json, ref.decode("ascii"))
+            if result is not None:
+                self.stat_hits += 1
+                return result
+
+        pcm = await run_blocking(load_pcm, audio_path)
+        audio_key = self.audio_key(pcm, language)
+        result = await run_blocking(self._get_json, audio_key)
+        if result is not None:
+            self.content_hits += 1
+        else:
+            self.misses += 1
+            result = await transcribe_pcm(pcm, language)
+            payload = json.dumps(result, ensure_ascii=False).encode("utf-8")
+            await run_blocking(self.store.put, audio_key, payload)
+            logging.info(f"STT cache store {audio_key[:12]} ({len(pcm)} samples)")
+        await run_blocking(self.store.put, stat_key, audio_key.encode("ascii"))
+        return result
+
+    @staticmethod
+    def long_key(audio_path: str, language: str, max_segment_s: float) -> str:
+        st = os.stat(audio_path)
+        return content_key("stt-long", os.path.abspath(audio_path), st.st_size, st.st_mtime_ns,
+                           language, max_segment_s)
+
+    async def transcribe_long(self, audio_path: str, language: str, max_segment_s: float,
+                              transcribe_file) -> dict:
+        """
+        Long-form counterpart of `transcribe`, keyed on (path, size, mtime) only.
+
+        Hashing the content would mean reading the whole recording up front,
+        which long-form mode exists to avoid.
+
+        Args:
+            audio_path (str): Local WAV file.
+            language (str): Recognition language; part of the key.
+            max_segment_s (float): Segment bound; part of the key.
+            transcribe_file: Async callable (path, language) -> stitched result dict.
+
+        Returns:
+            dict: Stitched long-form result.
+        """
+        key = await run_blocking(self.long_key, audio_path, language, max_segment_s)
+        result = await run_blocking(self._get_json, key)
+        if result is not None:
+            self.stat_hits += 1
+            return result
+        self.misses += 1
+        result = await transcribe_file(audio_path, language)
+        payload = json.dumps(result, ensure_ascii=False).encode("utf-8")
+        await run_blocking(self.store.put, key, payload)
+        logging.info(f"STT cache store {key[:12]} (long-form, {len(result['segments'])} segments)")
+        return result
+
+    def stats(self) -> dict:
+        lookups = self.stat_hits + self.content_hits + self.misses
+        return {
+            "stat_hits": self.stat_hits,
+            "content_hits": self.content_hits,
+            "misses": self.misses,
+            "hit_rate": (self.stat_hits + self.content_hits) / lookups if lookups else 0.0,
+            "evictions": self.store.evictions,
+            "expirations": self.store.expirations,
+            "entries": len(self.store),
+            "bytes": self.store.size,
+        }
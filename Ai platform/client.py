@@ -49,6 +49,22 @@ prompt="""You are an AI assistant integrated into a Model Context Protocol (MCP)
 
 
 
+# Tools whose progress messages are text deltas. The others (tts_stream_tool,
+# the batch tools, audio_fetch_tool) send JSON/base64 payloads as progress.
+TEXT_STREAM_TOOLS = {"llm_tool"}
+
+
+def progress_printer(tool_name):
+    """Progress callback for `tool_name`: echo streamed text, only count anything else."""
+    async def print_progress(progress, total, message):
+        if tool_name in TEXT_STREAM_TOOLS:
+            if message:
+                print(message, end="", flush=True)
+        else:
+            print(f"\r  {tool_name}: {progress:g}" + (f"/{total:g}" if total else ""), end="", flush=True)
+    return print_progress
+
+
 async def main():
     async with streamablehttp_client("http://localhost:8000/mcp") as (reader, writer, session_id):
         async with ClientSession(reader, writer) as session:
@@ -127,12 +143,14 @@ async def main():
                                 logging.info(f"Calling tool: {tool_name} with arguments: {arguments}")
                                 
                                 try:
-                                    response = await session.call_tool(tool_name, arguments=arguments)
+                                    response = await session.call_tool(
+                                        tool_name, arguments=arguments, progress_callback=progress_printer(tool_name)
+                                    )
                                     
                                     # Handle response generically
                                     if response.content:
                                         response_text = response.content[0].text if hasattr(response.content[0], 'text') else str(response.content[0])
-                                        print(f"Response: {response_text}")
+                                        print(f"\nResponse: {response_text}")
                                         logging.info(f"Tool {tool_name} response: {response_text}")
                                     else:
                                         print(f"Response: {response}")
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import os
+import threading
+import weakref
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Pool and timeout settings (seconds); override through the environment.
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "120"))
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2 = os.getenv("HTTP_HTTP2", "1") != "0"
+except ImportError:
+    HTTP2 = False
+
+_lock = threading.Lock()
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _client_options() -> dict:
+    return {
+        "http2": HTTP2,
+        "timeout": httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=POOL_SIZE,
+            max_keepalive_connections=POOL_SIZE,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def get_client() -> httpx.Client:
+    """
+    Return the process-wide pooled, keep-alive HTTP client.
+
+    The client is created on first use and reused by every Hamsa STT/TTS
+    call, so TCP/TLS connections survive across utterances.
+
+    Returns:
+        httpx.Client: Shared synchronous client.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = httpx.Client(**_client_options())
+                logging.info(f"HTTP client pool created (size={POOL_SIZE}, http2={HTTP2})")
+    return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Return the pooled async HTTP client for the running event loop.
+
+    httpx async connections are bound to the loop that opened them, so one
+    client is kept per loop.
+
+    Returns:
+        httpx.AsyncClient: Shared asynchronous client.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(**_client_options())
+        _async_clients[loop] = client
+        logging.info(f"Async HTTP client pool created (size={POOL_SIZE}, http2={HTTP2})")
+    return client
+
+
+def configure(pool_size: int = None, connect_timeout: float = None, read_timeout: float = None) -> None:
+    """
+    Change pool size or timeouts. Takes effect for clients created afterwards,
+    so call it before the first request (or after `close()`).
+    """
+    global POOL_SIZE, CONNECT_TIMEOUT, READ_TIMEOUT
+    if pool_size is not None:
+        POOL_SIZE = pool_size
+    if connect_timeout is not None:
+        CONNECT_TIMEOUT = connect_timeout
+    if read_timeout is not None:
+        READ_TIMEOUT = read_timeout
+
+
+def post(url: str, **kwargs) -> httpx.Response:
+    """POST through the shared synchronous client."""
+    return get_client().post(url, **kwargs)
+
+
+async def apost(url: str, **kwargs) -> httpx.Response:
+    """POST through the shared async client of the running loop."""
+    return await get_async_client().post(url, **kwargs)
+
+
+def close() -> None:
+    """Close the synchronous client and drop its pooled connections."""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+async def aclose() -> None:
+    """Close the async client belonging to the running event loop."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import mmap
+import os
+import time
+from collections import namedtuple
+import numpy as np
+from dotenv import load_dotenv
+from audio_core import TARGET_RATE, decode_range_mono, normalize_range_to_pcm16, parse_wav_header
+from worker_pool import run_blocking
+
+load_dotenv()
+
+# Upper bound on one segment's length and on concurrent segment requests.
+LONGFORM_SEGMENT_S = float(os.getenv("STT_LONGFORM_SEGMENT_S", "30"))
+LONGFORM_CONCURRENCY = int(os.getenv("STT_LONGFORM_CONCURRENCY", "4"))
+
+FRAME_MS = 30
+# A frame is silent when it is at most this far (dB) above the noise floor,
+# or a third of the way from the floor to the speech level if that is more.
+SILENCE_MARGIN_DB = 6.0
+# Energy is computed over blocks of this many seconds, bounding the decode buffer.
+ENERGY_BLOCK_S = 60
+
+Segment = namedtuple("Segment", "seq start stop")  # source frames [start, stop)
+
+
+def result_text(result: dict) -> str:
+    """Transcript text from a Hamsa STT result, whichever field carries it."""
+    return (result.get("transcript") or result.get("text") or result.get("data", {}).get("text") or "").strip()
+
+
+def open_wav(audio_path: str):
+    """
+    Memory-map a WAV file read-only.
+
+    Returns:
+        tuple[mmap.mmap, WavInfo]: The mapping and its parsed header.
+    """
+    with open(audio_path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return mm, parse_wav_header(mm)
+    except Exception:
+        mm.close()
+        raise
+
+
+def frame_energy_db(data, info, frame_ms: int = FRAME_MS) -> np.ndarray:
+    """
+    Per-frame RMS level (dBFS) of a WAV payload, decoded block by block.
+
+    Args:
+        data: Bytes-like object (e.g. an mmap) holding the WAV file.
+        info (WavInfo): Header info from `parse_wav_header(data)`.
+        frame_ms (int): Analysis frame length.
+
+    Returns:
+        np.ndarray: float32 level of each whole frame.
+    """
+    frame = max(1, info.samplerate * frame_ms // 1000)
+    total = info.data_size // (info.channels * info.sampwidth) // frame
+    per_block = max(1, info.samplerate * ENERGY_BLOCK_S // frame)
+    levels = np.empty(total, dtype=np.float32)
+    for first in range(0, total, per_block):
+        n = min(per_block, total - first)
+        mono = decode_range_mono(data, info, first * frame, (first + n) * frame)
+        power = np.square(mono.reshape(n, frame)).mean(axis=1)
+        levels[first:first + n] = 10 * np.log10(power + 1e-10)
+    return levels
+
+
+def silence_threshold(levels: np.ndarray) -> float:
+    """
+    dBFS level below which a frame counts as silence (see SILENCE_MARGIN_DB).
+
+    Without at least two margins of contrast between quiet and loud frames
+    there is no telling silence from speech, so nothing counts as silent.
+    """
+    floor, speech = np.percentile(levels, [2, 90])
+    if speech - floor < 2 * SILENCE_MARGIN_DB:
+        return float("-inf")
+    return float(floor + max(SILENCE_MARGIN_DB, (speech - floor) / 3))
+
+
+def longest_run_center(mask: np.ndarray):
+    """Index at the middle of the longest run of True in `mask`, or None."""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.astype(np.int8), [0]))))
+    if not len(edges):
+        return None
+    starts, ends = edges[::2], edges[1::2]
+    i = int(np.argmax(ends - starts))
+    return int(starts[i] + ends[i]) // 2
+
+
+def split_on_silence(levels: np.ndarray, max_frames: int, min_frames: int = None) -> list:
+    """
+    Cut a recording into segments of at most `max_frames`, at silences.
+
+    Each cut goes in the middle of the longest silent run between
+    `min_frames` and `max_frames` after the previous cut (at the quietest
+    frame if there is none). Segments that are silent throughout are
+    dropped.
+
+    Args:
+        levels (np.ndarray): Per-frame dBFS levels (see `frame_energy_db`).
+        max_frames (int): Longest segment, in frames.
+        min_frames (int): Shortest segment cut before the end (default max/3).
+
+    Returns:
+        list[tuple[int, int]]: (start, stop) frame ranges in order.
+    """
+    if min_frames is None:
+        min_frames = max(1, max_frames // 3)
+    if not len(levels):
+        return []
+    silent = levels < silence_threshold(levels)
+
+    cuts = [0]
+    while len(levels) - cuts[-1] > max_frames:
+        lo, hi = cuts[-1] + min_frames, cuts[-1] + max_frames
+        center = longest_run_center(silent[lo:hi])
+        cuts.append(lo + (center if center is not None else int(np.argmin(levels[lo:hi]))))
+    cuts.append(len(levels))
+    return [(a, b) for a, b in zip(cuts, cuts[1:]) if not silent[a:b].all()]
+
+
+def plan_segments(audio_path: str, max_segment_s: float = LONGFORM_SEGMENT_S):
+    """
+    Memory-map `audio_path` and split it at silences.
+
+    Returns:
+        tuple[mmap.mmap, WavInfo, list[Segment]]: The open mapping (caller
+        closes it), its header and the segments in source frames.
+    """
+    mm, info = open_wav(audio_path)
+    try:
+        levels = frame_energy_db(mm, info)
+        frame = max(1, info.samplerate * FRAME_MS // 1000)
+        max_frames = max(1, int(max_segment_s * 1000) // FRAME_MS)
+        ranges = split_on_silence(levels, max_frames)
+    except Exception:
+        mm.close()
+        raise
+    total = info.data_size // (info.channels * info.sampwidth)
+    segments = [Segment(seq, a * frame, total if b == len(levels) else b * frame)
+                for seq, (a, b) in enumerate(ranges)]
+    return mm, info, segments
+
+
+async def transcribe_long(audio_path: str, language: str, transcribe_pcm,
+                          max_segment_s: float = LONGFORM_SEGMENT_S,
+                          concurrency: int = LONGFORM_CONCURRENCY) -> dict:
+    """
+    Transcribe a long recording as silence-split segments in parallel.
+
+    The file is memory-mapped rather than read; each segment is normalized
+    to 16-kHz mono PCM on the worker pool only when its request is about to
+    start, so memory is bounded by `concurrency` segments, not the file.
+
+    Args:
+        audio_path (str): Local WAV file.
+        language (str): Recognition language.
+        transcribe_pcm: Async callable (pcm, language) -> API result dict.
+        max_segment_s (float): Longest segment sent in one request.
+        concurrency (int): Segment requests in flight at once.
+
+    Returns:
+        dict: {"text": str, "duration": float, "segments": [{"seq", "start",
+               "end", "text"}, ...]} with segment times in seconds, in order.
+    """
+    start = time.perf_counter()
+    mm, info, segments = await run_blocking(plan_segments, audio_path, max_segment_s)
+    limit = asyncio.Semaphore(max(1, concurrency))
+    decodes = []  # worker-pool jobs reading the mapping
+
+    async def transcribe(segment: Segment) -> dict:
+        async with limit:
+            # Shielded: cancelling the segment cannot stop a worker thread that
+            # is reading the mapping, so the job is left to finish and awaited below.
+            decode = asyncio.ensure_future(run_blocking(normalize_range_to_pcm16, mm, info,
+                                                        segment.start, segment.stop, TARGET_RATE))
+            decodes.append(decode)
+            pcm = await asyncio.shield(decode)
+            result = await transcribe_pcm(pcm, language)
+        return {"seq": segment.seq, "start": round(segment.start / info.samplerate, 3),
+                "end": round(segment.stop / info.samplerate, 3), "text": result_text(result)}
+
+    tasks = [asyncio.ensure_future(transcribe(s)) for s in segments]
+    try:
+        results = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, *decodes, return_exceptions=True)  # no worker may still read the mapping
+        try:
+            mm.close()
+        except BufferError:
+            # A view outlived its job; the mapping is released when it is collected.
+            # Never let this replace the exception that brought us here.
+            logging.warning(f"Long-form STT: {audio_path} still mapped after transcription")
+
+    duration = info.data_size / (info.channels * info.sampwidth) / info.samplerate
+    logging.info(f"Long-form STT: {duration:.0f}s audio in {len(segments)} segments "
+                 f"({concurrency} parallel) took {(time.perf_counter() - start) * 1000:.0f} ms")
+    return {
+        "text": " ".join(r["text"] for r in results if r["text"]),
+        "duration": round(duration, 3),
+        "segments": results,
+    }
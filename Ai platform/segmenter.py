@@ -0,0 +1,91 @@
+import re
+
+# Sentence-final punctuation (Latin and Arabic) plus line breaks.
+_SENTENCE_END = re.compile(r"(?<=[.!?؟۔…])\s+|\n+")
+
+
+def split_sentences(text: str) -> list:
+    """
+    Split text into sentences on Latin and Arabic sentence punctuation.
+
+    Handles ".", "!", "?", the Arabic question mark "؟", the Arabic full
+    stop "۔", the ellipsis and line breaks. Punctuation stays attached to
+    its sentence so prosody is preserved when segments are synthesized
+    separately.
+
+    Args:
+        text (str): Text to split.
+
+    Returns:
+        list[str]: Non-empty, stripped sentences in order.
+    """
+    return [s.strip() for s in _SENTENCE_END.split(text) if s and s.strip()]
+
+
+def pop_sentences(buffer: str):
+    """
+    Split the complete sentences off the front of a growing text buffer.
+
+    Uses the same boundaries as `split_sentences`, so text streamed in
+    pieces is cut exactly where the whole text would be. A sentence is
+    complete once the whitespace after its punctuation has arrived.
+
+    Args:
+        buffer (str): Text received so far.
+
+    Returns:
+        tuple[list[str], str]: Complete sentences, and the unfinished remainder.
+    """
+    sentences = []
+    start = 0
+    for m in _SENTENCE_END.finditer(buffer):
+        sentence = buffer[start:m.start()].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = m.end()
+    return sentences, buffer[start:]
+
+
+# Clause punctuation (Latin and Arabic comma/semicolon, colon) used to break long sentences.
+_CLAUSE_END = re.compile(r"(?<=[,،;؛:])\s+")
+
+
+def split_chunks(text: str, max_chars: int = 200) -> list:
+    """
+    Split text into synthesis chunks of at most `max_chars` characters.
+
+    Sentences (see `split_sentences`) are packed greedily into chunks.
+    A sentence longer than `max_chars` is broken at clause punctuation
+    ("،", "؛", ",", ";", ":"), and a clause still longer than that at word
+    boundaries, so every chunk ends on a natural pause where possible.
+
+    Args:
+        text (str): Text to split.
+        max_chars (int): Upper bound on chunk length (a single longer word
+                         is kept whole).
+
+    Returns:
+        list[str]: Non-empty chunks in order.
+    """
+    pieces = []
+    for sentence in split_sentences(text):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        for clause in _CLAUSE_END.split(sentence):
+            if len(clause) <= max_chars:
+                pieces.append(clause)
+            else:
+                pieces.extend(_pack(clause.split(), max_chars))
+    return _pack(pieces, max_chars)
+
+
+def _pack(pieces: list, max_chars: int) -> list:
+    """Join consecutive pieces with spaces while the result fits in `max_chars`."""
+    chunks = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) + 1 + len(piece) <= max_chars:
+            chunks[-1] += " " + piece
+        else:
+            chunks.append(piece)
+    return chunks
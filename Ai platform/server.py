@@ -1,8 +1,20 @@
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
+import asyncio
+import glob
+import json
 import logging
-from LLM import create_model, generate_content_sync
-from tts import hamsa_tts
-from ASR import hamsa_stt
+import os
+import time
+from LLM import create_model, generate_content_async
+from tts import hamsa_tts_async, hamsa_tts_long_async
+from ASR import prepare_audio_pcm, hamsa_stt_pcm_async
+from longform import LONGFORM_CONCURRENCY, LONGFORM_SEGMENT_S, transcribe_long
+from upload import UploadSession, UploadSessions
+from worker_pool import run_blocking
+from cache import AudioBlobStore, TTSCache, TranscriptCache, content_key
+from singleflight import SingleFlight
+from segmenter import split_sentences
+from audio_core import sniff_audio_format
 import base64
 
 # Initialize FastMCP with no tools registered
@@ -17,13 +29,46 @@ logging.basicConfig(
 # Create a new model instance for the llm tool
 llm_model = create_model("gemini-2.5-flash")
 
+# Repeated phrases (greetings, confirmations, prompts) are served from here
+tts_cache = TTSCache()
+# Batch jobs resubmit the same recordings; transcripts are reused by content
+stt_cache = TranscriptCache()
+# tts_tool output, served by URI instead of inline base64 (expires after AUDIO_BLOB_TTL)
+audio_blobs = AudioBlobStore()
+
+# Chunked audio uploads for stt_upload_* (idle sessions expire)
+uploads = UploadSessions()
+
+# Identical requests arriving while one is already in flight share its result
+llm_flight = SingleFlight("llm_tool")
+tts_flight = SingleFlight("tts_tool")
+stt_flight = SingleFlight("stt_tool")
+
+# Parallel segment syntheses per tts_stream_tool call
+TTS_STREAM_CONCURRENCY = int(os.getenv("TTS_STREAM_CONCURRENCY", "4"))
+
+# Bytes per progress notification when audio_fetch_tool streams a blob
+AUDIO_FETCH_CHUNK = int(os.getenv("AUDIO_FETCH_CHUNK", str(256 * 1024)))
+
+# Batch tools: items in flight at once (default and cap), retries per failed item,
+# first retry delay (seconds)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+BATCH_RETRIES = int(os.getenv("BATCH_RETRIES", "2"))
+BATCH_RETRY_BACKOFF = float(os.getenv("BATCH_RETRY_BACKOFF", "0.5"))
+
 @mcp.tool()
 def hello(name: str):
     """ a function that says hello"""
     return f"Hello, {name}!"
 
+def _progress_token(ctx: Context):
+    """The client's progress token for this call, or None if it did not ask for progress."""
+    meta = ctx.request_context.meta if ctx is not None else None
+    return meta.progressToken if meta else None
+
 @mcp.tool()
-def llm_tool(prompt: str):
+async def llm_tool(prompt: str, stream: bool = True, ctx: Context = None):
     """
     Invokes the underlying Gemini LLM to generate text based on a client-provided prompt.
 
@@ -34,16 +79,24 @@ def llm_tool(prompt: str):
 
     Args:
         prompt (str): The textual instruction or query sent to the model.
+        stream (bool): Forward partial output while it is generated (default: True).
+                       Takes effect when the client supplies a progress token.
 
     Returns:
-        str or AsyncIterator[str]:
-            - A full, non-streamed response when called synchronously.
-            - A token/word-level async iterator when streaming is enabled.
+        str: The full response text. When streaming, each chunk is also sent
+             as it arrives in a progress notification whose `message` holds the
+             chunk text and whose `progress` counts chunks, so voice clients can
+             start TTS before generation finishes.
     """
 
     try:
         logging.info(f"LLM tool called with prompt: {prompt}")
-        response = generate_content_sync(prompt, model_instance=llm_model)
+        if stream and _progress_token(ctx) is not None:
+            response = await _stream_llm(prompt, ctx)
+        else:
+            response = await llm_flight.do(
+                content_key("llm", prompt), generate_content_async, prompt, model_instance=llm_model
+            )
         logging.info(f"LLM tool response generated successfully")
         return response
     except Exception as e:
@@ -51,39 +104,220 @@ def llm_tool(prompt: str):
         logging.error(error_msg)
         return error_msg
 
+async def _stream_llm(prompt: str, ctx: Context) -> str:
+    """Generate with stream=True, forwarding chunks as progress notifications."""
+    start = time.perf_counter()
+    ttft = None
+    parts = []
+    response = await generate_content_async(prompt, stream=True, model_instance=llm_model)
+    async for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:  # chunk without text parts (e.g. finish/safety metadata)
+            continue
+        if not text:
+            continue
+        if ttft is None:
+            ttft = time.perf_counter() - start
+            logging.info(f"LLM tool time-to-first-token: {ttft * 1000:.0f} ms")
+        parts.append(text)
+        await ctx.report_progress(progress=len(parts), message=text)
+    total = time.perf_counter() - start
+    logging.info(f"LLM tool streamed {len(parts)} chunks in {total * 1000:.0f} ms")
+    return "".join(parts)
+
 @mcp.tool()
-def tts_tool(text: str, speaker="Noura", dialect="pls"):
+async def tts_tool(text: str, speaker="Noura", dialect="pls", long_text: bool = False, inline: bool = False):
     """
     Convert text into spoken audio using the Hamsa real-time TTS engine.
 
     This tool provides a simple MCP interface for generating natural-sounding
     Arabic speech. Clients can specify the text to be synthesized along with
-    the desired speaker voice and dialect. The resulting audio is returned as
-    a base64-encoded byte stream, allowing MCP clients or UIs to play, store,
-    or process the audio without additional decoding steps.
+    the desired speaker voice and dialect. The audio is kept in the server's
+    blob store and returned as a resource URI with its metadata, so the
+    bytes cross the wire only when the client reads the resource
+    (`audio://tts/{id}`, or `audio://tts/{id}/{offset}/{length}` for a
+    byte range) or calls `audio_fetch_tool`. Blobs expire AUDIO_BLOB_TTL
+    seconds after they were last produced. Audio for text that was
+    synthesized before (after whitespace/diacritic normalization) is served
+    from the TTS cache instead of the network.
+
+    With `long_text`, the text is split on sentence/clause punctuation into
+    chunks of at most TTS_LONG_MAX_CHARS characters that are synthesized
+    concurrently (TTS_LONG_CONCURRENCY at once, each through the cache) and
+    stitched into one WAV with short crossfades at the joins, so long
+    announcements are not one long serial synthesis.
 
     Args:
         text (str): The text content to synthesize into speech.
         speaker (str): The TTS voice model to use (e.g., "Noura", "Adam").
         dialect (str): The target dialect code supported by Hamsa
                        (e.g., "pls" for Gulf/Modern Standard variants).
+        long_text (bool): Synthesize in parallel chunks and stitch (default: False).
+        inline (bool): Also return the audio as base64 (default: False).
 
     Returns:
         dict: A structured response containing:
-            - "audio_base64" (str): Base64-encoded audio bytes produced by the TTS service.
-            - "speaker" (str): The speaker voice used.
-            - "dialect" (str): The dialect used for synthesis.
+            - "uri" (str): Resource URI of the audio (audio://tts/{id}).
+            - "size_bytes" (int), "format" (str), "mime_type" (str),
+              "sample_rate" (int or None), "channels" (int or None),
+              "duration_s" (float or None): Audio metadata.
+            - "expires_in_s" (int): Seconds until the blob may be evicted.
+            - "audio_base64" (str): Base64-encoded audio, only with `inline`.
 
     Raises:
         Exception: If the TTS API request fails or returns a non-200 response.
     """
-    audio_bytes = hamsa_tts(text, speaker, dialect)
-    return {
-        "audio_base64": base64.b64encode(audio_bytes).decode("utf-8"),
-    }
+    if long_text:
+        audio_bytes = await hamsa_tts_long_async(text, speaker, dialect, synthesize=_synthesize)
+    else:
+        audio_bytes = await _synthesize(text, speaker, dialect)
+    result = await run_blocking(audio_blobs.put_audio, audio_bytes)
+    logging.info(f"TTS tool stored {result['uri']} ({result['size_bytes']} bytes)")
+    if inline:
+        audio_b64 = await run_blocking(base64.b64encode, audio_bytes)
+        result["audio_base64"] = audio_b64.decode("utf-8")
+    return result
+
+async def _read_blob(blob_id: str, offset: int = 0, length: int = None) -> bytes:
+    audio = await run_blocking(audio_blobs.read, blob_id, offset, length)
+    if audio is None:
+        raise ValueError(f"unknown or expired audio blob {blob_id!r}")
+    return audio
+
+@mcp.resource("audio://tts/{blob_id}", mime_type="audio/wav")
+async def tts_audio_resource(blob_id: str) -> bytes:
+    """Audio produced by tts_tool (the metadata returned with the URI gives the actual format)."""
+    return await _read_blob(blob_id)
+
+@mcp.resource("audio://tts/{blob_id}/{offset}/{length}", mime_type="application/octet-stream")
+async def tts_audio_range_resource(blob_id: str, offset: str, length: str) -> bytes:
+    """Bytes [offset, offset + length) of audio produced by tts_tool."""
+    return await _read_blob(blob_id, int(offset), int(length))
 
 @mcp.tool()
-def stt_tool(audio_path: str, language: str = "ar") -> dict:
+async def audio_fetch_tool(uri: str, offset: int = 0, length: int = None,
+                           chunk_size: int = AUDIO_FETCH_CHUNK, ctx: Context = None) -> dict:
+    """
+    Fetch audio returned by tts_tool, whole, as a byte range, or streamed.
+
+    For clients that do not read MCP resources. With a progress token, the
+    requested range is sent in `chunk_size` pieces as progress notifications
+    whose `message` is a JSON object {"offset": int, "audio_base64": str},
+    so playback can start on the first piece.
+
+    Args:
+        uri (str): URI returned by tts_tool (audio://tts/{id}).
+        offset (int): First byte to return.
+        length (int): Number of bytes (default: to the end).
+        chunk_size (int): Bytes per streamed piece.
+
+    Returns:
+        dict: The blob's metadata (see tts_tool) plus "offset" and "length"
+              of the range, and "audio_base64" when not streaming.
+
+    Raises:
+        ValueError: If the URI is not an audio blob or the blob has expired.
+    """
+    blob_id = AudioBlobStore.blob_id(uri)
+    try:
+        meta = await run_blocking(audio_blobs.describe, blob_id)
+    except KeyError as e:
+        raise ValueError(e.args[0])
+    end = meta["size_bytes"] if length is None else min(meta["size_bytes"], offset + length)
+    result = {**meta, "offset": offset, "length": max(0, end - offset)}
+    if _progress_token(ctx) is None:
+        audio = await _read_blob(blob_id, offset, result["length"])
+        result["audio_base64"] = (await run_blocking(base64.b64encode, audio)).decode("ascii")
+        return result
+
+    chunk_size = max(1, chunk_size)
+    pieces = -(-result["length"] // chunk_size)
+    for i, pos in enumerate(range(offset, end, chunk_size)):
+        audio = await _read_blob(blob_id, pos, min(chunk_size, end - pos))
+        audio_b64 = await run_blocking(base64.b64encode, audio)
+        await ctx.report_progress(progress=i + 1, total=pieces,
+                                  message=json.dumps({"offset": pos, "audio_base64": audio_b64.decode("ascii")}))
+    return result
+
+async def _synthesize(text: str, speaker: str, dialect: str) -> bytes:
+    """TTS through the cache, coalescing identical in-flight requests."""
+    return await tts_flight.do(
+        tts_cache.key(text, speaker, dialect, False),
+        tts_cache.get_or_synthesize, text, speaker, dialect, False, hamsa_tts_async
+    )
+
+@mcp.tool()
+async def tts_stream_tool(text: str, speaker="Noura", dialect="pls", ctx: Context = None):
+    """
+    Convert text into speech segment by segment, streaming audio as it is ready.
+
+    The text is split at sentence boundaries (Latin and Arabic punctuation)
+    and segments are synthesized concurrently (bounded by
+    TTS_STREAM_CONCURRENCY). Each segment is sent to the client, in order, as
+    soon as it and all earlier segments are ready, as a progress notification
+    whose `message` is a JSON object:
+
+        {"seq": 0, "total": 3, "text": "...", "format": "wav",
+         "sample_rate": 16000, "channels": 1, "audio_base64": "..."}
+
+    so playback can start after the first sentence instead of the whole text.
+
+    Args:
+        text (str): The text content to synthesize into speech.
+        speaker (str): The TTS voice model to use (e.g., "Noura", "Adam").
+        dialect (str): The target dialect code supported by Hamsa.
+
+    Returns:
+        dict: {"segments": int, "total_bytes": int, "format": str, "sample_rate": int}
+              when segments were streamed. If the client did not supply a
+              progress token, "segments" is instead the list of segment
+              objects described above.
+
+    Raises:
+        Exception: If any segment's TTS request fails.
+    """
+    sentences = split_sentences(text) or [text]
+    streaming = _progress_token(ctx) is not None
+    limit = asyncio.Semaphore(TTS_STREAM_CONCURRENCY)
+
+    async def synthesize(sentence):
+        async with limit:
+            return await _synthesize(sentence, speaker, dialect)
+
+    tasks = [asyncio.ensure_future(synthesize(s)) for s in sentences]
+    start = time.perf_counter()
+    segments = []
+    total_bytes = 0
+    meta = {}
+    try:
+        for seq, (sentence, task) in enumerate(zip(sentences, tasks)):
+            audio = await task
+            if seq == 0:
+                logging.info(f"TTS stream time-to-first-segment: {(time.perf_counter() - start) * 1000:.0f} ms")
+            meta = sniff_audio_format(audio)
+            audio_b64 = await run_blocking(base64.b64encode, audio)
+            segment = {"seq": seq, "total": len(sentences), "text": sentence, **meta,
+                       "audio_base64": audio_b64.decode("ascii")}
+            total_bytes += len(audio)
+            if streaming:
+                await ctx.report_progress(progress=seq + 1, total=len(sentences),
+                                          message=json.dumps(segment, ensure_ascii=False))
+            else:
+                segments.append(segment)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if not streaming:
+        return {"segments": segments, "total_bytes": total_bytes}
+    return {"segments": len(sentences), "total_bytes": total_bytes,
+            "format": meta.get("format"), "sample_rate": meta.get("sample_rate")}
+
+@mcp.tool()
+async def stt_tool(audio_path: str, language: str = "ar", long_form: bool = False,
+                   max_segment_s: float = LONGFORM_SEGMENT_S,
+                   parallelism: int = LONGFORM_CONCURRENCY) -> dict:
     """
     MCP Tool: Convert speech audio to text using the Hamsa STT service.
 
@@ -91,12 +325,23 @@ def stt_tool(audio_path: str, language: str = "ar") -> dict:
     16-kHz mono PCM format, encodes it as Base64, and submits it to the
     Hamsa real-time speech recognition API. The transcription returned
     by the API is structured and ready for use inside an MCP client or
-    downstream processing pipeline.
+    downstream processing pipeline. Transcripts are cached by audio content
+    and language; unchanged files (same path, size and mtime) are answered
+    without being re-read.
+
+    With `long_form`, the file is memory-mapped instead of loaded, split at
+    silences into segments of at most `max_segment_s` seconds, and the
+    segments are transcribed concurrently (at most `parallelism` at once),
+    so hour-long recordings neither hold the whole file in memory several
+    times over nor run as one slow request.
 
     Args:
         audio_path (str): Path to the input audio (WAV). The tool ensures
                           proper conversion to a supported PCM format.
         language (str): Language code for recognition (default: 'ar').
+        long_form (bool): Use silence-split parallel transcription (default: False).
+        max_segment_s (float): Longest segment per request in long-form mode.
+        parallelism (int): Concurrent segment requests in long-form mode.
 
     Returns:
         dict: {
@@ -104,11 +349,33 @@ def stt_tool(audio_path: str, language: str = "ar") -> dict:
             "language": str,     # Language used
             "raw_response": dict # Full API response for debugging or metadata
         }
+        In long-form mode "raw_response" is {"text", "duration", "segments"},
+        where each segment is {"seq", "start", "end", "text"} (seconds), in order.
 
     Raises:
         Exception: If audio processing or API interaction fails.
     """
-    result = hamsa_stt(audio_path, language)
+    if long_form:
+        async def transcribe_file(path, lang):
+            return await transcribe_long(path, lang, hamsa_stt_pcm_async, max_segment_s, parallelism)
+
+        # os.stat can be slow (network mounts): keep it off the event loop.
+        key = await run_blocking(stt_cache.long_key, audio_path, language, max_segment_s)
+        result = await stt_flight.do(
+            key,
+            stt_cache.transcribe_long, audio_path, language, max_segment_s, transcribe_file
+        )
+        return {
+            "transcript": result["text"],
+            "language": language,
+            "raw_response": result
+        }
+
+    key = await run_blocking(stt_cache.stat_key, audio_path, language)
+    result = await stt_flight.do(
+        key,
+        stt_cache.transcribe, audio_path, language, prepare_audio_pcm, hamsa_stt_pcm_async
+    )
 
     return {
         "transcript": result.get("transcript") or result.get("text") or "",
@@ -116,6 +383,287 @@ def stt_tool(audio_path: str, language: str = "ar") -> dict:
         "raw_response": result
     }
 
+@mcp.tool()
+async def stt_upload_begin(language: str = "ar", audio_format: str = "wav", sample_rate: int = 16000,
+                           channels: int = 1, max_segment_s: float = LONGFORM_SEGMENT_S,
+                           parallelism: int = LONGFORM_CONCURRENCY) -> dict:
+    """
+    Open a chunked audio upload for transcription, for clients whose audio
+    is not on the server's disk (or is still being recorded).
+
+    Send the audio with `stt_upload_append` and close it with
+    `stt_upload_finish`. While chunks arrive, the audio is cut at pauses
+    into segments of at most `max_segment_s` seconds and each completed
+    segment is normalized and transcribed in the background (at most
+    `parallelism` at once), so little work is left after the last chunk.
+    Sessions idle for STT_UPLOAD_SESSION_TTL seconds are discarded.
+
+    Args:
+        language (str): Language code for recognition (default: 'ar').
+        audio_format (str): "wav" (the bytes of a WAV file, header first) or
+                            "pcm16" (raw little-endian 16-bit PCM).
+        sample_rate (int): Sample rate of "pcm16" audio (ignored for WAV).
+        channels (int): Channel count of "pcm16" audio (ignored for WAV).
+        max_segment_s (float): Longest segment per STT request.
+        parallelism (int): Concurrent segment requests.
+
+    Returns:
+        dict: {"session_id": str, "received_bytes": int, "next_seq": int,
+               "segments_started": int, "segments_done": int, "buffered_s": float}
+    """
+    session = UploadSession(hamsa_stt_pcm_async, language, audio_format, sample_rate, channels,
+                            max_segment_s, parallelism)
+    uploads.add(session)
+    logging.info(f"Upload {session.id[:8]} opened ({audio_format}, {language})")
+    return session.status()
+
+@mcp.tool()
+async def stt_upload_append(session_id: str, chunk_base64: str, seq: int = None) -> dict:
+    """
+    Append the next Base64-encoded chunk to an upload session.
+
+    Chunks may split the audio at any byte. If `seq` is given (0, 1, 2, ...)
+    a resent chunk is ignored and a gap is rejected, so appends can be
+    retried safely.
+
+    Args:
+        session_id (str): Id returned by `stt_upload_begin`.
+        chunk_base64 (str): Base64 of the next bytes of audio.
+        seq (int): Position of this chunk in the upload (optional).
+
+    Returns:
+        dict: Session status (see `stt_upload_begin`).
+
+    Raises:
+        KeyError: If the session does not exist or has expired.
+        ValueError: If the chunk is out of order or the WAV header is invalid.
+    """
+    chunk = base64.b64decode(chunk_base64, validate=True)
+    return await uploads.get(session_id).append(chunk, seq)
+
+@mcp.tool()
+async def stt_upload_finish(session_id: str) -> dict:
+    """
+    Close an upload session and return its transcript.
+
+    Only the audio after the last segment boundary is transcribed here;
+    earlier segments are already in flight or done.
+
+    Args:
+        session_id (str): Id returned by `stt_upload_begin`.
+
+    Returns:
+        dict: {
+            "transcript": str,
+            "language": str,
+            "raw_response": dict  # {"text", "duration", "segments": [{"seq", "start",
+                                  #  "end", "text"}], "final_latency_ms"}
+        }
+
+    Raises:
+        KeyError: If the session does not exist or has expired.
+    """
+    session = uploads.pop(session_id)
+    try:
+        result = await session.finish()
+    finally:
+        session.cancel()
+    return {
+        "transcript": result["text"],
+        "language": session.language,
+        "raw_response": result
+    }
+
+@mcp.tool()
+def stt_upload_abort(session_id: str) -> dict:
+    """
+    Discard an upload session and cancel its in-flight segment requests.
+
+    Args:
+        session_id (str): Id returned by `stt_upload_begin`.
+
+    Returns:
+        dict: {"session_id": str, "aborted": True}
+    """
+    uploads.pop(session_id).cancel()
+    return {"session_id": session_id, "aborted": True}
+
+def _check_batch_args(label: str, concurrency: int, retries: int) -> None:
+    """Reject batch settings that would start no workers or never run an item."""
+    if not 1 <= concurrency <= BATCH_MAX_CONCURRENCY:
+        raise ValueError(f"{label}: concurrency must be between 1 and {BATCH_MAX_CONCURRENCY}, got {concurrency}")
+    if retries < 0:
+        raise ValueError(f"{label}: retries must be 0 or more, got {retries}")
+
+async def _run_batch(label: str, items: list, run_item, concurrency: int, retries: int,
+                     ctx: Context = None) -> dict:
+    """
+    Run `run_item` over `items` with `concurrency` workers, retrying failures.
+
+    Each finished item is reported as soon as it completes (in completion
+    order) as a progress notification whose `message` is a JSON object
+    {"index", "ok", "attempts", ...result or "error"}; without a progress
+    token the entries are returned in input order instead.
+    """
+    streaming = _progress_token(ctx) is not None
+    pending = asyncio.Queue()
+    for index, item in enumerate(items):
+        pending.put_nowait((index, item))
+    finished = asyncio.Queue()
+    retried = 0
+
+    async def worker():
+        nonlocal retried
+        while not pending.empty():
+            index, item = pending.get_nowait()
+            for attempt in range(1, retries + 2):
+                try:
+                    entry = {"index": index, "ok": True, "attempts": attempt, **await run_item(item)}
+                    break
+                except Exception as e:
+                    if attempt > retries:
+                        entry = {"index": index, "ok": False, "attempts": attempt, "error": str(e)}
+                        break
+                    retried += 1
+                    logging.warning(f"{label} item {index} failed (attempt {attempt}), retrying: {e}")
+                    await asyncio.sleep(BATCH_RETRY_BACKOFF * 2 ** (attempt - 1))
+            await finished.put(entry)
+
+    start = time.perf_counter()
+    workers = [asyncio.ensure_future(worker()) for _ in range(min(concurrency, len(items)))]
+    entries = []
+    failures = []
+    try:
+        for done in range(1, len(items) + 1):
+            entry = await finished.get()
+            if not entry["ok"]:
+                failures.append(entry)
+            if streaming:
+                await ctx.report_progress(progress=done, total=len(items),
+                                          message=json.dumps(entry, ensure_ascii=False))
+            else:
+                entries.append(entry)
+    finally:
+        for w in workers:
+            w.cancel()
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "items": len(items),
+        "succeeded": len(items) - len(failures),
+        "failed": len(failures),
+        "retries": retried,
+        "elapsed_s": round(elapsed, 3),
+        "items_per_s": round(len(items) / elapsed, 3) if elapsed > 0 else None,
+        "failures": sorted(failures, key=lambda e: e["index"]),
+    }
+    logging.info(f"{label}: {summary['succeeded']}/{len(items)} ok, {retried} retries, "
+                 f"{elapsed:.2f}s ({summary['items_per_s']} items/s, concurrency {concurrency})")
+    if not streaming:
+        summary["results"] = sorted(entries, key=lambda e: e["index"])
+    return summary
+
+@mcp.tool()
+async def stt_batch_tool(audio_paths: list[str] = None, pattern: str = None, language: str = "ar",
+                         long_form: bool = False, concurrency: int = BATCH_CONCURRENCY,
+                         retries: int = BATCH_RETRIES, ctx: Context = None) -> dict:
+    """
+    Transcribe many audio files in one call with bounded concurrency.
+
+    Each file goes through `stt_tool` (cache, coalescing and, with
+    `long_form`, silence-split transcription included). At most
+    `concurrency` files are in flight; a failed file is retried up to
+    `retries` times with exponential backoff. With a progress token, each
+    file's result is streamed as soon as it completes (see `_run_batch`).
+
+    Args:
+        audio_paths (list[str]): Paths of the input WAV files.
+        pattern (str): Glob of files to add (e.g. "calls/**/*.wav"; "**" is recursive).
+        language (str): Language code for recognition (default: 'ar').
+        long_form (bool): Use long-form mode for every file.
+        concurrency (int): Files transcribed at once (1 to BATCH_MAX_CONCURRENCY).
+        retries (int): Retries per failed file (0 or more).
+
+    Returns:
+        dict: {"items", "succeeded", "failed", "retries", "elapsed_s",
+               "items_per_s", "failures"} plus, when not streaming,
+              "results": [{"index", "ok", "attempts", "audio_path",
+              "transcript" or "error"}, ...] in input order.
+    """
+    _check_batch_args("stt_batch_tool", concurrency, retries)
+    paths = list(audio_paths or [])
+    if pattern:
+        paths += sorted(glob.glob(pattern, recursive=True))
+    if not paths:
+        raise ValueError("stt_batch_tool needs audio_paths or a pattern matching at least one file")
+
+    async def transcribe(path):
+        result = await stt_tool(path, language, long_form=long_form)
+        return {"audio_path": path, "transcript": result["transcript"]}
+
+    return await _run_batch("stt_batch_tool", paths, transcribe, concurrency, retries, ctx)
+
+@mcp.tool()
+async def tts_batch_tool(items: list[dict | str], speaker="Noura", dialect="pls", long_text: bool = False,
+                         concurrency: int = BATCH_CONCURRENCY, retries: int = BATCH_RETRIES,
+                         ctx: Context = None) -> dict:
+    """
+    Synthesize many texts in one call with bounded concurrency.
+
+    Each item goes through `tts_tool` (cache and coalescing included). At
+    most `concurrency` items are in flight; a failed item is retried up to
+    `retries` times with exponential backoff. With a progress token, each
+    item's audio is streamed as soon as it completes (see `_run_batch`).
+
+    Args:
+        items (list[dict]): {"text": str, "speaker": str?, "dialect": str?}
+                            per item; a plain string is taken as the text.
+        speaker (str): Voice for items that do not name one.
+        dialect (str): Dialect for items that do not name one.
+        long_text (bool): Use long-text mode for every item.
+        concurrency (int): Items synthesized at once (1 to BATCH_MAX_CONCURRENCY).
+        retries (int): Retries per failed item (0 or more).
+
+    Returns:
+        dict: {"items", "succeeded", "failed", "retries", "elapsed_s",
+               "items_per_s", "failures"} plus, when not streaming,
+              "results": [{"index", "ok", "attempts", "text", "speaker",
+              "dialect", "uri" and audio metadata, or "error"}, ...] in
+              input order (see tts_tool).
+    """
+    _check_batch_args("tts_batch_tool", concurrency, retries)
+    if not items:
+        raise ValueError("tts_batch_tool needs at least one item")
+
+    async def synthesize(item):
+        if isinstance(item, str):
+            item = {"text": item}
+        voice = {"text": item["text"], "speaker": item.get("speaker", speaker),
+                 "dialect": item.get("dialect", dialect)}
+        result = await tts_tool(**voice, long_text=long_text)
+        return {**voice, **result}
+
+    return await _run_batch("tts_batch_tool", items, synthesize, concurrency, retries, ctx)
+
+@mcp.tool()
+def cache_stats() -> dict:
+    """
+    Report cache and request-coalescing counters.
+
+    Returns:
+        dict: {"tts": {...}, "stt": {...}, "uploads": {...}, "audio_blobs": {...},
+              "coalescing": {...}} with cache hit/miss/eviction counts, hit rates,
+              store sizes, open/expired upload sessions, and per-tool counts of calls,
+              upstream calls and coalesced duplicates.
+    """
+    return {
+        "tts": tts_cache.stats(),
+        "stt": stt_cache.stats(),
+        "uploads": uploads.stats(),
+        "audio_blobs": audio_blobs.stats(),
+        "coalescing": {f.name: f.stats() for f in (llm_flight, tts_flight, stt_flight)},
+    }
+
 if __name__ == "__main__":
     # Run MCP server using streamable HTTP transport
     mcp.run(transport="streamable-http")
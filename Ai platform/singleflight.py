@@ -0,0 +1,58 @@
+import asyncio
+import logging
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical async calls into one upstream call.
+
+    The first caller for a key (the leader) starts the work as a task; every
+    caller that arrives with the same key while it is still running awaits
+    that same task and gets the same result or exception. Callers are
+    shielded from each other: one client disconnecting does not cancel the
+    shared request for the rest.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.leaders = 0
+        self.coalesced = 0
+        self._inflight = {}
+
+    async def do(self, key, fn, *args, **kwargs):
+        """
+        Run `fn(*args, **kwargs)` once per key among concurrent callers.
+
+        Args:
+            key: Hashable identity of the request.
+            fn: Async callable doing the upstream work.
+
+        Returns:
+            The shared result of `fn`.
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.coalesced += 1
+            logging.info(f"{self.name}: coalesced duplicate in-flight request")
+        return await asyncio.shield(task)
+
+    def _done(self, key, task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every caller went away
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "upstream_calls": self.leaders,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
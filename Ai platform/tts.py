@@ -1,9 +1,47 @@
-import requests
-import io
+import asyncio
+import logging
+import time
+import http_client
+from audio_core import crossfade_concat, normalize_to_pcm16, parse_wav_header, pcm16_to_wav_buffer
+from segmenter import split_chunks
+from worker_pool import run_blocking
 from dotenv import load_dotenv
 import os
 load_dotenv()
 API_KEY = os.getenv("TTS_key")
+HAMSA_TTS_URL = "https://api.tryhamsa.com/v1/realtime/tts"
+
+# Long-text mode: chunk length, parallel chunk syntheses and the fade at each join.
+TTS_LONG_MAX_CHARS = int(os.getenv("TTS_LONG_MAX_CHARS", "200"))
+TTS_LONG_CONCURRENCY = int(os.getenv("TTS_LONG_CONCURRENCY", "4"))
+TTS_CROSSFADE_MS = float(os.getenv("TTS_CROSSFADE_MS", "15"))
+
+
+def _tts_request(text: str, speaker: str, dialect: str, mulaw: bool) -> dict:
+    """Build the keyword arguments for a Hamsa TTS POST."""
+    payload = {
+        "text": text,
+        "speaker": speaker,
+        "dialect": dialect,
+        "mulaw": mulaw
+    }
+
+    headers = {
+        "Authorization": f"Token {API_KEY}",
+        "Content-Type": "application/json"
+    }
+
+    return {"json": payload, "headers": headers}
+
+
+def _tts_result(response) -> bytes:
+    if response.status_code == 200:
+        return response.content  # raw audio bytes
+    else:
+        raise Exception(
+            f"TTS request failed: {response.status_code} - {response.text[:200]}"
+        )
+
 
 def hamsa_tts(text: str, speaker: str = "Noura", dialect: str = "pls", mulaw: bool = False) -> bytes:
     """
@@ -22,26 +60,90 @@ def hamsa_tts(text: str, speaker: str = "Noura", dialect: str = "pls", mulaw: bo
     Raises:
         Exception: If the API call fails or returns a non-200 status.
     """
+    response = http_client.post(HAMSA_TTS_URL, **_tts_request(text, speaker, dialect, mulaw))
+    return _tts_result(response)
 
-    url = "https://api.tryhamsa.com/v1/realtime/tts"
 
-    payload = {
-        "text": text,
-        "speaker": speaker,
-        "dialect": dialect,
-        "mulaw": mulaw
-    }
+async def hamsa_tts_async(text: str, speaker: str = "Noura", dialect: str = "pls", mulaw: bool = False) -> bytes:
+    """
+    Async version of `hamsa_tts` using the pooled async HTTP client.
 
-    headers = {
-        "Authorization": f"Token {API_KEY}",
-        "Content-Type": "application/json"
-    }
+    Args:
+        text (str): The text to synthesize into speech.
+        speaker (str): Voice model to use (e.g., "Noura", "Adam").
+        dialect (str): Arabic dialect code supported by Hamsa (e.g., "pls").
+        mulaw (bool): Whether to return µ-law encoded audio.
 
-    response = requests.post(url, json=payload, headers=headers)
+    Returns:
+        bytes: Raw audio bytes returned by the API.
 
-    if response.status_code == 200:
-        return response.content  # raw audio bytes
-    else:
-        raise Exception(
-            f"TTS request failed: {response.status_code} - {response.text[:200]}"
-        )
+    Raises:
+        Exception: If the API call fails or returns a non-200 status.
+    """
+    response = await http_client.apost(HAMSA_TTS_URL, **_tts_request(text, speaker, dialect, mulaw))
+    return _tts_result(response)
+
+
+def stitch_wavs(wavs: list, crossfade_ms: float = TTS_CROSSFADE_MS) -> bytes:
+    """
+    Join WAV clips into one WAV with crossfades, at the first clip's sample rate.
+
+    Raises:
+        ValueError: If a clip is not a WAV file (e.g. µ-law or MP3 output).
+    """
+    samplerate = parse_wav_header(wavs[0]).samplerate
+    pcm = crossfade_concat([normalize_to_pcm16(w, samplerate) for w in wavs], samplerate, crossfade_ms)
+    return bytes(pcm16_to_wav_buffer(pcm, samplerate))
+
+
+async def hamsa_tts_long_async(text: str, speaker: str = "Noura", dialect: str = "pls",
+                               synthesize=None, max_chars: int = TTS_LONG_MAX_CHARS,
+                               concurrency: int = TTS_LONG_CONCURRENCY,
+                               crossfade_ms: float = TTS_CROSSFADE_MS) -> bytes:
+    """
+    Synthesize long text as parallel chunks stitched into one WAV.
+
+    The text is split on sentence and clause punctuation into chunks of at
+    most `max_chars` characters (see `segmenter.split_chunks`); up to
+    `concurrency` chunks are synthesized at once and the decoded PCM is
+    joined with `crossfade_ms` raised-cosine crossfades.
+
+    Args:
+        text (str): The text to synthesize into speech.
+        speaker (str): Voice model to use (e.g., "Noura", "Adam").
+        dialect (str): Arabic dialect code supported by Hamsa (e.g., "pls").
+        synthesize: Async callable (text, speaker, dialect) -> WAV bytes
+                    (default: `hamsa_tts_async`), e.g. a cached wrapper.
+        max_chars (int): Longest chunk sent in one request.
+        concurrency (int): Chunk requests in flight at once.
+        crossfade_ms (float): Overlap at each join.
+
+    Returns:
+        bytes: One 16-bit mono WAV file.
+
+    Raises:
+        Exception: If any chunk's TTS request fails.
+        ValueError: If the API does not return WAV audio.
+    """
+    if synthesize is None:
+        synthesize = hamsa_tts_async
+    chunks = split_chunks(text, max_chars) or [text]
+    if len(chunks) == 1:
+        return await synthesize(chunks[0], speaker, dialect)
+    limit = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(chunk):
+        async with limit:
+            return await synthesize(chunk, speaker, dialect)
+
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(one(c)) for c in chunks]
+    try:
+        wavs = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    audio = await run_blocking(stitch_wavs, wavs, crossfade_ms)
+    logging.info(f"Long-text TTS: {len(text)} chars in {len(chunks)} chunks "
+                 f"({concurrency} parallel) took {(time.perf_counter() - start) * 1000:.0f} ms")
+    return audio
@@ -0,0 +1,286 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+import numpy as np
+from dotenv import load_dotenv
+from audio_core import (TARGET_RATE, WAVE_FORMAT_PCM, WavInfo, decode_range_mono,
+                        normalize_range_to_pcm16, parse_wav_header)
+from longform import (FRAME_MS, LONGFORM_CONCURRENCY, LONGFORM_SEGMENT_S, longest_run_center,
+                      result_text, silence_threshold)
+from worker_pool import run_blocking
+
+load_dotenv()
+
+# Idle sessions are dropped after this many seconds.
+UPLOAD_SESSION_TTL = float(os.getenv("STT_UPLOAD_SESSION_TTL", "600"))
+# Pause that closes a segment while chunks are still arriving.
+UPLOAD_MIN_SILENCE_MS = int(os.getenv("STT_UPLOAD_MIN_SILENCE_MS", "300"))
+# A WAV upload must have sent its full header within this many bytes.
+MAX_WAV_HEADER = 64 * 1024
+# The noise floor is estimated over this much of the most recent audio.
+UPLOAD_NOISE_WINDOW_S = float(os.getenv("STT_UPLOAD_NOISE_WINDOW_S", "120"))
+
+
+class UploadSession:
+    """
+    Audio arriving in chunks, transcribed segment by segment as it arrives.
+
+    Appended bytes are buffered in the source format and analyzed in
+    `FRAME_MS` frames. As soon as the audio since the last cut is at least
+    a third of `max_segment_s` long and contains a pause of
+    `UPLOAD_MIN_SILENCE_MS` (or reaches `max_segment_s`, cut at its
+    quietest point), that segment is normalized and sent to STT in the
+    background, and its bytes and levels are released. Silence is judged
+    against the last `UPLOAD_NOISE_WINDOW_S` of levels, kept in a fixed
+    ring, so the work per chunk does not grow with the upload. `finish()`
+    only has to transcribe the tail after the last cut.
+    """
+
+    def __init__(self, transcribe_pcm, language: str = "ar", audio_format: str = "wav",
+                 sample_rate: int = TARGET_RATE, channels: int = 1,
+                 max_segment_s: float = LONGFORM_SEGMENT_S, parallelism: int = LONGFORM_CONCURRENCY):
+        if audio_format not in ("wav", "pcm16"):
+            raise ValueError(f"unsupported upload format {audio_format!r} (expected 'wav' or 'pcm16')")
+        self.id = uuid.uuid4().hex
+        self.transcribe_pcm = transcribe_pcm
+        self.language = language
+        self.format = audio_format
+        self.info = None
+        if audio_format == "pcm16":
+            self.info = WavInfo(WAVE_FORMAT_PCM, channels, sample_rate, 2, 0, 0)
+        self.max_segment_s = max_segment_s
+        self.limit = asyncio.Semaphore(max(1, parallelism))
+        self.lock = asyncio.Lock()
+        self.buffer = bytearray()  # source-format bytes not yet cut into a segment
+        self.base = 0              # source frame at the start of `buffer`
+        self.analyzed = 0          # analysis frames measured since the start of the upload
+        self.levels = np.zeros(0, dtype=np.float32)  # dBFS of analyzed frames not yet cut off
+        self.recent = np.zeros(max(1, int(UPLOAD_NOISE_WINDOW_S * 1000) // FRAME_MS), dtype=np.float32)
+        self.threshold = float("-inf")  # silence level from `recent`
+        self.received = 0
+        self.next_seq = 0
+        self.tasks = []
+        self.touched = time.monotonic()
+
+    # -----------------------------
+    # Framing
+    # -----------------------------
+    @property
+    def frame(self) -> int:
+        """Source frames per analysis frame."""
+        return max(1, self.info.samplerate * FRAME_MS // 1000)
+
+    def _buffer_info(self) -> WavInfo:
+        return self.info._replace(data_offset=0, data_size=len(self.buffer))
+
+    def _frames_buffered(self) -> int:
+        return len(self.buffer) // (self.info.channels * self.info.sampwidth)
+
+    # -----------------------------
+    # Ingest
+    # -----------------------------
+    async def append(self, chunk: bytes, seq: int = None) -> dict:
+        """
+        Add the next chunk; start STT on any segment it completes.
+
+        A chunk whose `seq` was already received is ignored, so a client can
+        safely resend after a timeout.
+
+        Raises:
+            ValueError: If `seq` skips ahead, or the WAV header is invalid.
+                The chunk is then not counted, so it can be corrected and resent.
+        """
+        async with self.lock:
+            self.touched = time.monotonic()
+            if seq is not None:
+                if seq < self.next_seq:
+                    return self.status()
+                if seq > self.next_seq:
+                    raise ValueError(f"chunk {seq} arrived before chunk {self.next_seq}")
+            if self.info is None:
+                self.buffer = self._read_header(chunk)
+            else:
+                self.buffer += chunk
+            self.next_seq += 1
+            self.received += len(chunk)
+            if self.info is None:
+                return self.status()
+            await run_blocking(self._analyze)
+            while (cut := await run_blocking(self._find_cut)) is not None:
+                self._start_segment(cut)
+            return self.status()
+
+    def _read_header(self, chunk: bytes) -> bytearray:
+        """
+        Buffered bytes plus `chunk`, with the WAV header stripped (and `info`
+        set) once the `data` chunk has started. Leaves the session untouched
+        if it raises.
+        """
+        pending = self.buffer + chunk
+        try:
+            info = parse_wav_header(pending)
+        except ValueError:
+            head = bytes(pending[:12])
+            if (len(pending) > MAX_WAV_HEADER or not b"RIFF".startswith(head[:4])
+                    or not b"WAVE".startswith(head[8:12])):
+                raise ValueError("upload does not start with a valid WAV header")
+            return pending  # header not complete yet
+        self.info = info._replace(data_offset=0, data_size=0)
+        del pending[:info.data_offset]
+        return pending
+
+    def _analyze(self) -> None:
+        """Compute levels for whole analysis frames buffered since the last call (worker pool)."""
+        done = self.analyzed * self.frame - self.base  # analyzed frames still in the buffer
+        count = (self._frames_buffered() - done) // self.frame
+        if count <= 0:
+            return
+        mono = decode_range_mono(self.buffer, self._buffer_info(), done, done + count * self.frame)
+        power = np.square(mono.reshape(count, self.frame)).mean(axis=1)
+        levels = (10 * np.log10(power + 1e-10)).astype(np.float32)
+        self.levels = np.concatenate((self.levels, levels))
+
+        # Ring of the most recent levels; order does not matter for the percentiles.
+        size = len(self.recent)
+        tail = levels[-size:]
+        slots = (self.analyzed + count - len(tail) + np.arange(len(tail))) % size
+        self.recent[slots] = tail
+        self.analyzed += count
+        self.threshold = silence_threshold(self.recent[:min(self.analyzed, size)])
+
+    def _silence(self):
+        """Silent mask of the pending levels, against the recent noise floor."""
+        return self.levels < self.threshold
+
+    def _find_cut(self):
+        """Analysis frame (absolute) at which to close the pending segment, or None (worker pool)."""
+        first = self.base // self.frame
+        max_frames = max(1, int(self.max_segment_s * 1000) // FRAME_MS)
+        min_frames = max(1, max_frames // 3)
+        if len(self.levels) < min_frames:
+            return None
+        silent, levels = self._silence(), self.levels
+        pause = max(1, UPLOAD_MIN_SILENCE_MS // FRAME_MS)
+        window = silent[min_frames:max_frames]
+        if len(window) >= pause:
+            # First pause long enough after the minimum length: cut inside it.
+            runs = np.flatnonzero(np.convolve(window.astype(int), np.ones(pause, dtype=int), "valid") == pause)
+            if len(runs):
+                return first + min_frames + int(runs[0]) + pause // 2
+        if len(levels) < max_frames:
+            return None
+        center = longest_run_center(window)
+        return first + min_frames + (center if center is not None else int(np.argmin(levels[min_frames:max_frames])))
+
+    # -----------------------------
+    # Segments
+    # -----------------------------
+    def _start_segment(self, cut_frame: int = None) -> None:
+        """
+        Close the pending audio at analysis frame `cut_frame` (all of it if
+        None) and start transcribing it, unless it is silent throughout.
+        """
+        frames = self._frames_buffered() if cut_frame is None else cut_frame * self.frame - self.base
+        if frames <= 0:
+            return
+        first = self.base // self.frame
+        silent = self._silence()
+        if cut_frame is not None:
+            silent = silent[:cut_frame - first]
+        self.levels = self.levels[len(silent):]
+        size = frames * self.info.channels * self.info.sampwidth
+        if len(silent) and not silent.all():  # a tail under one frame is not worth a request
+            start_s = self.base / self.info.samplerate
+            end_s = (self.base + frames) / self.info.samplerate
+            segment = self._transcribe(len(self.tasks), bytes(self.buffer[:size]), frames, start_s, end_s)
+            self.tasks.append(asyncio.ensure_future(segment))
+        del self.buffer[:size]
+        self.base += frames
+
+    async def _transcribe(self, seq: int, data: bytes, frames: int, start_s: float, end_s: float) -> dict:
+        async with self.limit:
+            info = self.info._replace(data_offset=0, data_size=len(data))
+            pcm = await run_blocking(normalize_range_to_pcm16, data, info, 0, frames, TARGET_RATE)
+            result = await self.transcribe_pcm(pcm, self.language)
+        logging.info(f"Upload {self.id[:8]}: segment {seq} ({start_s:.1f}-{end_s:.1f}s) transcribed")
+        return {"seq": seq, "start": round(start_s, 3), "end": round(end_s, 3), "text": result_text(result)}
+
+    async def finish(self) -> dict:
+        """
+        Transcribe the remaining audio, wait for every segment and stitch the result.
+
+        Returns:
+            dict: {"text", "duration", "segments": [{"seq", "start", "end", "text"}],
+                   "final_latency_ms"}, where the latency is measured from this call.
+        """
+        start = time.perf_counter()
+        async with self.lock:
+            if self.info is None:
+                raise ValueError("upload finished before a complete WAV header arrived")
+            await run_blocking(self._analyze)
+            self._start_segment()
+            segments = await asyncio.gather(*self.tasks)
+        duration = self.base / self.info.samplerate
+        latency = (time.perf_counter() - start) * 1000
+        logging.info(f"Upload {self.id[:8]}: {duration:.1f}s in {len(segments)} segments, "
+                     f"finished {latency:.0f} ms after the last chunk")
+        return {
+            "text": " ".join(s["text"] for s in segments if s["text"]),
+            "duration": round(duration, 3),
+            "segments": list(segments),
+            "final_latency_ms": round(latency),
+        }
+
+    def cancel(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+
+    def status(self) -> dict:
+        return {
+            "session_id": self.id,
+            "received_bytes": self.received,
+            "next_seq": self.next_seq,
+            "segments_started": len(self.tasks),
+            "segments_done": sum(t.done() for t in self.tasks),
+            "buffered_s": round(self._frames_buffered() / self.info.samplerate, 3) if self.info else 0.0,
+        }
+
+
+class UploadSessions:
+    """Open upload sessions by id; sessions idle for longer than `ttl` are dropped."""
+
+    def __init__(self, ttl: float = UPLOAD_SESSION_TTL):
+        self.ttl = ttl
+        self.expired = 0
+        self._sessions = {}
+
+    def add(self, session: UploadSession) -> UploadSession:
+        self.purge()
+        self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id: str) -> UploadSession:
+        self.purge()
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise KeyError(f"unknown or expired upload session {session_id!r}")
+        return session
+
+    def pop(self, session_id: str) -> UploadSession:
+        session = self.get(session_id)
+        del self._sessions[session_id]
+        return session
+
+    def purge(self) -> None:
+        now = time.monotonic()
+        for session_id, session in list(self._sessions.items()):
+            if now - session.touched > self.ttl and not session.lock.locked():
+                del self._sessions[session_id]
+                session.cancel()
+                self.expired += 1
+                logging.info(f"Upload {session_id[:8]} expired")
+
+    def stats(self) -> dict:
+        return {"open": len(self._sessions), "expired": self.expired}
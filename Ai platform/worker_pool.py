@@ -0,0 +1,27 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Upper bound on concurrent CPU-bound jobs (audio decode/resample/encode).
+MAX_WORKERS = int(os.getenv("AUDIO_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="audio-worker")
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """
+    Run a CPU-bound function on the bounded worker pool and await its result.
+
+    NumPy releases the GIL for the heavy array work, so threads give real
+    parallelism here while keeping the event loop free for other clients.
+
+    Args:
+        fn: Callable to run.
+        *args, **kwargs: Passed through to `fn`.
+
+    Returns:
+        Whatever `fn` returns.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,157 @@
+"""
+Microphone capture decoupled from VAD.
+
+The PortAudio callback only copies each block into the endpointer's ring
+buffer and bumps counters; no VAD, allocation or printing happens on the
+audio thread. A consumer thread walks the ring frame by frame, runs the
+endpointer and queues every finished utterance.
+"""
+
+import queue
+import threading
+import time
+import sounddevice as sd
+import numpy as np
+from endpointer import Endpointer
+
+
+class MicCapture:
+    """
+    Mono int16 microphone stream feeding an `Endpointer` from a consumer thread.
+
+    Use as a context manager; call `next_utterance()` to get segmented speech.
+    If `on_speech` is given it is called from the consumer thread, once per
+    utterance, as soon as `speech_ms` of speech has been heard (used for
+    barge-in).
+
+    With `chunk_pause_ms` set, speech is also cut into chunks while the user
+    is still talking (see `Endpointer.take_chunk`); read them with
+    `next_chunk()` instead of `next_utterance()`.
+    Capture health is available from `stats()`:
+
+    - `input_overflows` / `input_underflows`: PortAudio status flags seen in
+      the callback (the device dropped or padded samples).
+    - `ring_overruns`: times the consumer fell more than a ring's worth
+      behind and had to skip audio.
+    """
+
+    def __init__(self, endpointer: Endpointer, device=None, on_speech=None, speech_ms: int = 150,
+                 chunk_pause_ms: int = None, min_chunk_ms: int = 1000, max_chunk_ms: int = 4000):
+        self.endpointer = endpointer
+        self.on_speech = on_speech
+        self.speech_ms = speech_ms
+        self.chunk_pause_ms = chunk_pause_ms
+        self.min_chunk_ms = min_chunk_ms
+        self.max_chunk_ms = max_chunk_ms
+        self.ring = endpointer.ring
+        self.device = device
+        self.utterances = queue.Queue()
+        self.chunks = queue.Queue()
+        self.input_overflows = 0
+        self.input_underflows = 0
+        self.ring_overruns = 0
+        self.blocks = 0
+        self._stream = None
+        self._consumer = None
+        self._running = False
+
+    # Runs on the PortAudio thread: keep it to a copy and a few increments.
+    def _callback(self, indata, frames, time_info, status):
+        if status.input_overflow:
+            self.input_overflows += 1
+        if status.input_underflow:
+            self.input_underflows += 1
+        self.ring.write(indata[:, 0])
+        self.blocks += 1
+
+    def _consume(self):
+        ep = self.endpointer
+        size = ep.frame_size
+        cursor = self.ring.written
+        idle = ep.frame_ms / 2000
+        announced = None  # start index of the utterance on_speech last fired for
+        while self._running:
+            written = self.ring.written
+            if written - cursor > self.ring.capacity - size:
+                # Producer lapped us; skip to the oldest audio still intact.
+                self.ring_overruns += 1
+                cursor = written - (self.ring.capacity - size)
+                cursor -= cursor % size
+            if written - cursor < size:
+                time.sleep(idle)
+                continue
+            frame = self.ring.read(cursor, cursor + size)
+            cursor += size
+            if ep.analyze(frame, cursor):
+                if self.chunk_pause_ms is None:
+                    self.utterances.put(ep.utterance())
+                else:
+                    self.chunks.put((ep.final_chunk(), True))
+                ep.reset()
+                continue
+            if self.chunk_pause_ms is not None:
+                chunk = ep.take_chunk(self.chunk_pause_ms, self.min_chunk_ms, self.max_chunk_ms)
+                if chunk is not None:
+                    self.chunks.put((chunk, False))
+            if (self.on_speech is not None and ep.start is not None and ep.start != announced
+                    and ep.speech_ms >= self.speech_ms):
+                announced = ep.start
+                self.on_speech()
+
+    def start(self):
+        self.endpointer.reset()
+        self._running = True
+        self._consumer = threading.Thread(target=self._consume, name="vad-consumer", daemon=True)
+        self._consumer.start()
+        try:
+            self._stream = sd.InputStream(samplerate=self.endpointer.samplerate, channels=1, dtype="int16",
+                                          blocksize=self.endpointer.frame_size, device=self.device,
+                                          callback=self._callback)
+            self._stream.start()
+        except Exception:
+            self.stop()
+            raise
+
+    def stop(self):
+        self._running = False
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        if self._consumer is not None:
+            self._consumer.join()
+            self._consumer = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def next_utterance(self, timeout: float = None) -> np.ndarray | None:
+        """Block until the next utterance is endpointed; None on timeout."""
+        try:
+            return self.utterances.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def next_chunk(self, timeout: float = None):
+        """
+        Block until the next streaming chunk.
+
+        Returns:
+            (samples, final) where `final` marks the last chunk of an
+            utterance, or None on timeout.
+        """
+        try:
+            return self.chunks.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stats(self) -> dict:
+        return {
+            "blocks": self.blocks,
+            "input_overflows": self.input_overflows,
+            "input_underflows": self.input_underflows,
+            "ring_overruns": self.ring_overruns,
+        }
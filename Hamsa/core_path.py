@@ -0,0 +1,15 @@
+"""
+Makes the shared audio/HTTP/text core importable from the Hamsa scripts.
+
+`audio_core`, `http_client` and `segmenter` live once, next to the MCP
+server in `../Ai platform`. The scripts here run standalone from this
+directory, so each imports this module before importing any of them.
+"""
+
+import os
+import sys
+
+CORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Ai platform")
+
+if CORE_DIR not in sys.path:
+    sys.path.append(CORE_DIR)
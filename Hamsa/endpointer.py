@@ -0,0 +1,186 @@
+"""
+Utterance endpointing for the Hamsa voice loop.
+
+- `RingBuffer`: preallocated int16 ring addressed by absolute sample index.
+- `Endpointer`: frame-by-frame speech start/end detection on top of
+  webrtcvad, with pre-roll, hangover, an adaptive noise floor and a
+  hangover that follows the speaker's pause rhythm.
+"""
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-capacity sample ring. Writers append; readers copy out any range
+    of the last `capacity` samples by absolute index.
+    """
+
+    def __init__(self, capacity: int, dtype=np.int16):
+        self.capacity = capacity
+        self.buf = np.zeros(capacity, dtype=dtype)
+        self.written = 0  # absolute number of samples ever written
+
+    def write(self, samples: np.ndarray):
+        n = len(samples)
+        if n >= self.capacity:
+            samples = samples[-self.capacity:]
+            self.written += n - self.capacity
+            n = self.capacity
+        pos = self.written % self.capacity
+        first = min(n, self.capacity - pos)
+        self.buf[pos:pos + first] = samples[:first]
+        self.buf[:n - first] = samples[first:]
+        self.written += n
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Copy samples [start, end) (absolute indices) out of the ring."""
+        start = max(start, self.written - self.capacity, 0)
+        end = min(end, self.written)
+        out = np.empty(max(0, end - start), dtype=self.buf.dtype)
+        if len(out):
+            pos = start % self.capacity
+            first = min(len(out), self.capacity - pos)
+            out[:first] = self.buf[pos:pos + first]
+            out[first:] = self.buf[:len(out) - first]
+        return out
+
+
+class Endpointer:
+    """
+    Detect one utterance in a stream of fixed-size PCM frames.
+
+    A frame counts as speech when webrtcvad says so *and* its RMS is
+    `snr` times above the tracked noise floor. Speech starts after
+    `onset_ms` of consecutive speech and includes `preroll_ms` of audio
+    before it, so the first syllable is not clipped. Speech ends once
+    silence lasts longer than the hangover; the hangover tracks the
+    speaker's own intra-utterance pauses (fast talkers get a shorter one),
+    clamped to [min_hangover_ms, max_hangover_ms]. Noise floor and pause
+    statistics carry over between utterances.
+    """
+
+    def __init__(self, vad, samplerate: int = 16000, frame_ms: int = 10,
+                 max_utterance_ms: int = 30000, preroll_ms: int = 300, onset_ms: int = 30,
+                 min_speech_ms: int = 150, min_hangover_ms: int = 300, max_hangover_ms: int = 1000,
+                 tail_ms: int = 150, snr: float = 2.0):
+        self.vad = vad
+        self.samplerate = samplerate
+        self.frame_ms = frame_ms
+        self.frame_size = samplerate * frame_ms // 1000
+        self.max_utterance = samplerate * max_utterance_ms // 1000
+        self.preroll = samplerate * preroll_ms // 1000
+        self.onset_frames = max(1, onset_ms // frame_ms)
+        self.min_speech_ms = min_speech_ms
+        self.min_hangover_ms = min_hangover_ms
+        self.max_hangover_ms = max_hangover_ms
+        self.tail = samplerate * tail_ms // 1000
+        self.snr = snr
+
+        # One second of slack lets a capture consumer lag without losing the pre-roll.
+        self.ring = RingBuffer(self.preroll + self.max_utterance + samplerate)
+        self.noise_rms = 100.0                                    # ~ -50 dBFS to start
+        self.pause_ms = (min_hangover_ms + max_hangover_ms) / 4   # typical intra-utterance pause
+        self.reset()
+
+    @property
+    def hangover_ms(self) -> float:
+        return min(self.max_hangover_ms, max(self.min_hangover_ms, 2.0 * self.pause_ms))
+
+    def reset(self):
+        """Forget the current utterance (keeps noise/pause statistics)."""
+        self.start = None        # absolute index where the utterance begins (incl. pre-roll)
+        self.end = None          # absolute index where it ends, once confirmed
+        self.last_speech = 0     # absolute index just past the last speech frame
+        self.speech_ms = 0
+        self.run = 0             # consecutive speech frames while waiting for onset
+        self.silence_ms = 0
+        self.position = 0        # absolute index just past the last analyzed frame
+        self.chunk_start = None  # absolute index where the next streaming chunk begins
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        rms = float(np.sqrt(np.mean(frame.astype(np.float32) ** 2)))
+        voiced = self.vad.is_speech(frame.tobytes(), self.samplerate) and rms > self.noise_rms * self.snr
+        if not voiced:
+            self.noise_rms += 0.05 * (rms - self.noise_rms)
+        return voiced
+
+    def process(self, frame: np.ndarray) -> bool:
+        """
+        Append one frame and update the endpoint state.
+
+        Returns:
+            True once end of speech is confirmed (or the max length is hit);
+            `utterance()` is then ready.
+        """
+        if self.end is not None:
+            return True
+        self.ring.write(frame)
+        return self.analyze(frame, self.ring.written)
+
+    def analyze(self, frame: np.ndarray, frame_end: int) -> bool:
+        """State update for a frame that is already in the ring and ends at `frame_end`."""
+        speech = self.is_speech(frame)
+        self.position = frame_end
+
+        if self.start is None:
+            self.run = self.run + 1 if speech else 0
+            if self.run >= self.onset_frames:
+                onset = frame_end - self.run * self.frame_size
+                self.start = max(0, onset - self.preroll)
+                self.chunk_start = self.start
+                self.last_speech = frame_end
+                self.speech_ms = self.run * self.frame_ms
+                self.silence_ms = 0
+            return False
+
+        if speech:
+            if self.silence_ms:
+                # A pause inside the utterance: learn the speaker's rhythm.
+                self.pause_ms += 0.2 * (min(self.silence_ms, self.max_hangover_ms) - self.pause_ms)
+            self.silence_ms = 0
+            self.speech_ms += self.frame_ms
+            self.last_speech = frame_end
+        else:
+            self.silence_ms += self.frame_ms
+
+        if self.silence_ms >= self.hangover_ms:
+            if self.speech_ms < self.min_speech_ms:
+                self.reset()  # a click or cough, not an utterance
+                return False
+            self.end = min(frame_end, self.last_speech + self.tail)
+        elif frame_end - self.start >= self.max_utterance:
+            self.end = frame_end
+        return self.end is not None
+
+    def utterance(self) -> np.ndarray:
+        """Copy of the detected utterance (empty if none was confirmed)."""
+        if self.start is None or self.end is None:
+            return np.zeros(0, dtype=np.int16)
+        return self.ring.read(self.start, self.end)
+
+    def take_chunk(self, pause_ms: int, min_chunk_ms: int, max_chunk_ms: int) -> np.ndarray | None:
+        """
+        Cut the audio heard since the last chunk while the utterance is still going.
+
+        A chunk is cut at an intra-utterance pause of `pause_ms` once it is
+        at least `min_chunk_ms` long, or unconditionally at `max_chunk_ms`.
+
+        Returns:
+            The chunk's samples, or None if no cut is due yet.
+        """
+        if self.start is None or self.end is not None or self.speech_ms < self.min_speech_ms:
+            return None
+        pending = self.position - self.chunk_start
+        if (pending >= self.samplerate * max_chunk_ms // 1000
+                or (pending >= self.samplerate * min_chunk_ms // 1000 and self.silence_ms >= pause_ms)):
+            chunk = self.ring.read(self.chunk_start, self.position)
+            self.chunk_start = self.position
+            return chunk
+        return None
+
+    def final_chunk(self) -> np.ndarray:
+        """Audio after the last streamed chunk, once the end is confirmed (may be empty)."""
+        if self.start is None or self.end is None:
+            return np.zeros(0, dtype=np.int16)
+        return self.ring.read(self.chunk_start, self.end)
@@ -1,10 +1,7 @@
-import requests
-import pygame
-import io
-import base64
-import wave
-import numpy as np
-from pydub import AudioSegment
+import core_path  # noqa: F401  (puts the shared audio_core/http_client on sys.path)
+import http_client
+from audio_core import wav_to_base64
+from playback import AudioOutput, stream_to_clip
 
 # -----------------------------
 # Configuration
@@ -15,25 +12,15 @@ TTS_URL = "https://api.tryhamsa.com/v1/realtime/tts"
 STT_API_KEY = "9e769996-f062-4362-b005-1b359b42ccd8"   # Replace with your STT API key
 TTS_API_KEY = "9e769996-f062-4362-b005-1b359b42ccd8"   # Replace with your TTS API key
 
+# Persistent output stream, opened on first playback and reused afterwards
+output = AudioOutput()
+
 # -----------------------------
 # Convert audio file to Base64 PCM WAV
 # -----------------------------
 def convert_audio_to_base64(audio_file):
     try:
-        audio = AudioSegment.from_wav(audio_file)
-        audio = audio.set_channels(1).set_sample_width(2).set_frame_rate(16000)
-        raw_audio_data = np.array(audio.get_array_of_samples())
-
-        with wave.open("processed.wav", "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)
-            wf.setframerate(16000)
-            wf.writeframes(raw_audio_data.tobytes())
-
-        with open("processed.wav", "rb") as wf:
-            audio_bytes = wf.read()
-
-        return base64.b64encode(audio_bytes).decode("utf-8")
+        return wav_to_base64(audio_file)
     except Exception as e:
         print(f"Error converting audio: {e}")
         return None
@@ -54,7 +41,7 @@ def transcribe_audio(audio_file):
     }
     headers = {"Authorization": f"Token {STT_API_KEY}", "Content-Type": "application/json"}
 
-    response = requests.post(STT_URL, json=payload, headers=headers)
+    response = http_client.post(STT_URL, json=payload, headers=headers)
     if response.status_code == 200:
         result = response.json()
         print("STT Result:", result)
@@ -82,30 +69,21 @@ def speak_text(text, speaker="Noura", dialect="msa"):
     }
     headers = {"Authorization": f"Token {TTS_API_KEY}", "Content-Type": "application/json"}
 
-    response = requests.post(TTS_URL, json=payload, headers=headers)
-
-    if response.status_code == 200:
+    clip = output.enqueue(output.clip())
+    with http_client.get_client().stream("POST", TTS_URL, json=payload, headers=headers) as response:
+        if response.status_code != 200:
+            response.read()
+            clip.finish()
+            print("TTS Error:", response.text)
+            return
         try:
-            # Try to parse JSON first
-            result = response.json()
-            if "audioBase64" in result:
-                audio_data = base64.b64decode(result["audioBase64"])
-            else:
-                print("Unexpected JSON:", result)
-                return
-        except Exception:
-            # If not JSON, assume raw audio bytes
-            audio_data = response.content
-
-        # Initialize mixer with correct sample rate
-        pygame.mixer.init(frequency=16000)
-        sound = pygame.mixer.Sound(io.BytesIO(audio_data))
-        sound.play()
-        while pygame.mixer.get_busy():
-            pygame.time.Clock().tick(10)
-        print("TTS played successfully.")
-    else:
-        print("TTS Error:", response.text)
+            # Plays through the persistent output stream while the body downloads
+            stream_to_clip(response, clip)
+        except ValueError as e:
+            print("Unexpected TTS response:", e)
+            return
+    clip.done.wait()
+    print("TTS played successfully.")
 
 
 # -----------------------------
@@ -9,23 +9,28 @@ This code represents a live interactive conversation system using voice input an
    - **Audio Settings:** 
      - `samplerate`: Sampling rate for audio input.
      - `frame_ms`: Frame size for speech processing.
-     - `silence_ms`: Silence detection threshold to stop recording.
+     - `silence_ms`: Initial end-of-speech hangover; `max_utterance_ms` and `preroll_ms` size the capture ring buffer.
 
 2. **Audio Utilities:**
    - **`pcm_frames_to_wav_bytes(pcm_frames)`**: Converts raw PCM audio frames to WAV format (in-memory), which is then used for processing or API interaction.
-   - **`record_audio_continuous()`**: Continuously records audio using `sounddevice` and processes it with WebRTC Voice Activity Detection (VAD). The VAD distinguishes between speech and silence to manage audio recording duration.
+   - **`record_audio_continuous()`**: Records one utterance using `sounddevice` and the `Endpointer` from `endpointer.py` (WebRTC VAD gated by an adaptive noise floor, pre-roll, and a hangover that follows the speaker's pauses). The `MicCapture` callback (`capture.py`) only copies frames into a preallocated ring buffer; VAD runs on a consumer thread, the utterance is returned the moment end of speech is confirmed, and overflow/underflow counters are printed when capture drops audio.
 
 3. **Speech-to-Text (STT) Conversion:**
-   - **`transcribe_audio_bytes(wav_bytes)`**: Sends the recorded audio (in WAV format) to the Hamsa STT service, which transcribes it into text. It uses Base64 encoding to send the audio data as part of the POST request.
+   - **Streaming STT (`stt_streaming`)**: While the user is still talking, speech is cut into chunks at short pauses (`chunk_pause_ms`, bounded by `min_chunk_ms`/`max_chunk_ms`) and each chunk is sent to the realtime endpoint with EOS detection on (`transcribe_chunk`). The partial transcripts are stitched in order, so the final transcript is ready within about one short chunk's STT time after end of speech, however long the utterance.
+   - **`transcribe_audio_bytes(wav_bytes)`**: Sends the recorded audio (in WAV format) to the Hamsa STT service, which transcribes it into text. It uses Base64 encoding to send the audio data as part of the POST request. `transcribe_audio_async` does the same on the pooled async client.
 
 4. **AI Interaction (OpenAI):**
    - **`generate_response(user_text)`**: This function sends the transcribed user text to OpenAI’s GPT model (`gpt-4o-mini`), generating a response based on the conversation history.
+   - **`memory`**: A `ConversationMemory` (`memory.py`) holds the history: a sliding window of recent turns within `memory_max_tokens`, with older turns summarized in the background into a compact running summary. Each turn's prompt-token count is printed, so prompt size can be seen to stay flat on long calls.
+   - **`generate_response_stream(user_text, timings)`**: Streams the same completion and yields it sentence by sentence (split with `segmenter.pop_sentences`, the same boundaries as `tts_stream_tool`) as soon as each sentence is complete.
+   - **`Speculation`**: With `speculate` on, once the streamed partial transcript has been stable for `speculate_ms`, the reply (and, with `speculate_tts`, the first sentence's audio) is generated ahead of end of speech. It is committed if the final transcript matches and discarded otherwise; the hit rate and the time saved per hit are printed when the conversation ends.
 
 5. **Text-to-Speech (TTS) Output:**
-   - **`speak_text(text, speaker="Majd", dialect="egy")`**: This function sends the generated response to the TTS API and plays the resulting speech using the `pygame` mixer. The speech can be customized with different speakers and dialects.
+   - **`FillerBank`**: Short dialect-specific acknowledgements (`FILLER_PHRASES`, e.g. "لحظة من فضلك") synthesized once at startup and held as decoded PCM, bounded by `filler_max_bytes` and `filler_startup_s`. When the predicted end-of-speech to first-audio latency exceeds `filler_threshold_ms` and the agent is idle, one is played as soon as the transcript is known to be non-empty.
+   - **`speak_text(text, speaker="Majd", dialect="egy")`**: This function sends the generated response to the TTS API and plays the resulting speech through the persistent `AudioOutput` stream (`playback.py`) while the response is still downloading. The speech can be customized with different speakers and dialects. The pipeline uses the async equivalent, `start_speech`, which streams each sentence into a `Clip`.
 
 6. **Conversation Loop:**
-   - **`live_conversation()`**: The main loop of the system, which continuously records audio, converts it to text, generates a response from OpenAI, and plays the response out loud. The loop continues until the user ends the conversation by saying "bye" or a similar farewell phrase.
+   - **`live_conversation()`**: The main loop of the system, built as independent asyncio stages (`capture_stage` → `stt_stage` → `llm_stage` → `tts_stage` → `playback_stage`) joined by bounded queues (`queue_size`, `tts_parallel`) that apply backpressure. The microphone stays open, so the next utterance can be captured and transcribed while the current answer is generated and played; synthesis of sentence N+1 overlaps playback of sentence N. After each turn it prints the time-to-first-audio and every stage's queue depth and latency. With `barge_in` enabled (full duplex), user speech during an answer stops playback, cancels the in-flight LLM/TTS work and starts a new turn; the reaction latency of each barge-in is printed. The loop continues until the user ends the conversation by saying "bye" or a similar farewell phrase.
 
 7. **Run:**
    - The system starts the conversation loop by invoking `asyncio.run(live_conversation())`.
@@ -37,15 +42,23 @@ This system allows for real-time, interactive voice-based conversations with AI,
 
 import os
 import io
+import time
 import wave
 import base64
 import asyncio
-import requests
-import pygame
-import sounddevice as sd
+import contextlib
+import core_path  # noqa: F401  (puts the shared audio_core/http_client/segmenter on sys.path)
+import http_client
+import httpx
 import webrtcvad
 import numpy as np
 from openai import AsyncOpenAI
+from audio_core import normalize_to_pcm16
+from endpointer import Endpointer
+from capture import MicCapture
+from memory import ConversationMemory
+from playback import AudioOutput, Clip, astream_to_clip, stream_to_clip
+from segmenter import pop_sentences
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -60,14 +73,39 @@ STT_API_KEY = os.getenv("STT_API_KEY")
 TTS_API_KEY = os.getenv("TTS_API_KEY")
 samplerate = 16000
 frame_ms = 10          # Frame size in ms (must be 10, 20, or 30 for VAD)
-silence_ms = 500      # Stop after ~1s of silence
+silence_ms = 500      # Initial end-of-speech hangover; adapts to the speaker's pauses
+max_utterance_ms = 30000  # Longest single utterance kept in the ring buffer
+preroll_ms = 300       # Audio kept from before speech onset
 vad = webrtcvad.Vad(2)  # VAD aggressiveness: 0–3 (higher = more sensitive)
+endpointer = Endpointer(vad, samplerate, frame_ms, max_utterance_ms=max_utterance_ms,
+                        preroll_ms=preroll_ms, min_hangover_ms=silence_ms // 2,
+                        max_hangover_ms=silence_ms * 2)
+tts_parallel = 3        # Sentences synthesized ahead of playback at once
+queue_size = 2          # Depth of each inter-stage queue (backpressure)
+barge_in = True         # Full duplex: user speech interrupts the agent's answer
+barge_in_ms = 150       # Speech needed before a barge-in fires
+stt_streaming = True    # Transcribe speech chunks while the user is still talking
+chunk_pause_ms = 200    # Pause that closes a streaming chunk
+min_chunk_ms = 1000     # Shortest chunk cut at a pause
+max_chunk_ms = 4000     # Longest chunk; bounds the STT delay after end of speech
+eos_threshold = 0.3     # Hamsa end-of-speech threshold sent with streamed chunks
+speculate = True        # Start the reply early once the partial transcript is stable (needs stt_streaming)
+speculate_ms = 300      # How long the partial transcript must stay unchanged
+speculate_tts = True    # Also synthesize the speculative reply's first sentence
+fillers = True          # Play a short acknowledgement when the answer is predicted to be slow
+filler_threshold_ms = 1200      # Predicted end-of-speech -> first-audio latency that triggers a filler
+filler_max_bytes = 2 * 2**20    # PCM memory cap for the filler bank
+filler_startup_s = 5.0          # Longest time spent synthesizing fillers at startup
+playback_jitter_ms = 60         # Audio buffered before a streamed clip starts playing
+memory_max_tokens = 1500        # Prompt budget for system prompt + summary + recent turns
+memory_max_messages = 16        # Most recent messages kept verbatim
+summary_tokens = 200            # Cap on the running summary of evicted turns
 
 # OpenAI client (read from environment)
 client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-# Initialize pygame mixer once
-pygame.mixer.init(frequency=16000)
+# Persistent output stream, opened on first use and shared by every reply
+output = AudioOutput(samplerate, jitter_ms=playback_jitter_ms)
 
 # -----------------------------
 # Audio utils
@@ -82,67 +120,50 @@ def pcm_frames_to_wav_bytes(pcm_frames: np.ndarray, samplerate: int = 16000) ->
     buf.seek(0)
     return buf.read()
 
-def record_audio_continuous():
-    print("🎙️ Listening... start speaking")
-
-    frame_size = int(samplerate * frame_ms / 1000)  # Samples per frame
-    audio_frames = []
-    continuous_silence_ms = 0
-
-    def callback(indata, frames, time, status):
-        nonlocal audio_frames, continuous_silence_ms
-        if status:
-            print(status)
-
-        pcm = indata[:, 0].copy()  # Mono audio channel
-        audio_frames.append(pcm)
-
-        # VAD expects bytes, so check if speech is detected
-        is_speech = vad.is_speech(pcm.tobytes(), samplerate)
+def record_audio_continuous() -> bytes | None:
+    """
+    Record one utterance and return it as in-memory WAV bytes.
 
-        if is_speech:
-            continuous_silence_ms = 0  # Reset silence counter when speech is detected
-        else:
-            continuous_silence_ms += frame_ms  # Increment silence duration
-
-        # Continue recording if there's speech, else stop after silence
-        if continuous_silence_ms >= silence_ms:
-            pass
+    Capture runs through `MicCapture`: the audio callback only fills the
+    ring buffer and VAD/endpointing run on a consumer thread. Returns as
+    soon as end of speech is confirmed (or the utterance hits
+    `max_utterance_ms`); None if nothing was captured.
+    """
+    print("🎙️ Listening... start speaking")
 
+    audio = None
+    mic = MicCapture(endpointer)
     try:
-        # Start the recording stream with specified parameters
-        with sd.InputStream(samplerate=samplerate, channels=1, dtype='int16',
-                            blocksize=frame_size, callback=callback):
-            sd.sleep(1000000000)  # Keep listening indefinitely
-
+        with mic:
+            audio = mic.next_utterance()
     except Exception as e:
         print(f"Error in audio recording: {e}")
-        pass
-
-    # Combine all frames into a single audio array
-    audio = np.concatenate(audio_frames, axis=0)
-    
-    # Convert audio frames to WAV format in memory
-    wav_bytes = pcm_frames_to_wav_bytes(audio, samplerate)
 
-    return wav_bytes
+    health = mic.stats()
+    if health["input_overflows"] or health["input_underflows"] or health["ring_overruns"]:
+        print("⚠️ Capture health:", health)
+    if audio is None or not len(audio):
+        return None
+    print(f"🛑 End of speech ({len(audio) * 1000 // samplerate} ms, "
+          f"hangover {endpointer.hangover_ms:.0f} ms, noise floor {endpointer.noise_rms:.0f})")
+    return pcm_frames_to_wav_bytes(audio, samplerate)
 
 
 # -----------------------------
 # STT
 # -----------------------------
-def transcribe_audio_bytes(wav_bytes: bytes) -> str | None:
-    """Send PCM WAV bytes to Hamsa STT (Base64) and return text."""
+def _stt_request(wav_bytes: bytes, eos: bool = False) -> dict:
     audio_base64 = base64.b64encode(wav_bytes).decode("utf-8")
     payload = {
         "audioBase64": audio_base64,
         "language": "ar",
-        "isEosEnabled": False,
-        "eosThreshold": 0.3
+        "isEosEnabled": eos,
+        "eosThreshold": eos_threshold
     }
     headers = {"Authorization": f"Token {STT_API_KEY}", "Content-Type": "application/json"}
+    return {"json": payload, "headers": headers}
 
-    resp = requests.post(STT_URL, json=payload, headers=headers)
+def _stt_text(resp) -> str | None:
     if resp.status_code == 200:
         result = resp.json()
         print("STT Result:", result)
@@ -151,27 +172,171 @@ def transcribe_audio_bytes(wav_bytes: bytes) -> str | None:
         print("STT Error:", resp.text)
         return None
 
+def transcribe_audio_bytes(wav_bytes: bytes) -> str | None:
+    """Send PCM WAV bytes to Hamsa STT (Base64) and return text."""
+    resp = http_client.post(STT_URL, **_stt_request(wav_bytes))
+    return _stt_text(resp)
+
+async def transcribe_audio_async(wav_bytes: bytes, eos: bool = False) -> str | None:
+    """
+    Async `transcribe_audio_bytes` on the pooled async client.
+
+    Network errors (timeouts, refused connections) are reported like a
+    non-200 response, so one failed request never ends the conversation.
+    """
+    try:
+        resp = await http_client.apost(STT_URL, **_stt_request(wav_bytes, eos))
+    except httpx.HTTPError as e:
+        print(f"STT Error: {type(e).__name__}: {e}")
+        return None
+    return _stt_text(resp)
+
+async def transcribe_chunk(pcm: np.ndarray) -> str | None:
+    """Transcribe one streamed speech chunk with the realtime endpoint's EOS detection on."""
+    text = await transcribe_audio_async(pcm_frames_to_wav_bytes(pcm, samplerate), eos=True)
+    if text:
+        print("📝 Partial:", text)
+    return text
+
 
 # -----------------------------
 # OpenAI response (with history)
 # -----------------------------
-history = [{"role": "system", "content": "You are a helpful AI call assistant. Reply naturally in Arabic."}]
+memory = ConversationMemory(client, "You are a helpful AI call assistant. Reply naturally in Arabic.",
+                            max_tokens=memory_max_tokens, max_messages=memory_max_messages,
+                            summary_tokens=summary_tokens)
 
 async def generate_response(user_text: str) -> str:
-    history.append({"role": "user", "content": user_text})
+    messages = memory.messages(user_text)
     response = await client.chat.completions.create(
         model="gpt-4o-mini",
-        messages=history,
+        messages=messages,
     )
     reply_text = response.choices[0].message.content
-    history.append({"role": "assistant", "content": reply_text})
+    memory.record(messages, response.usage)
+    memory.add("user", user_text)
+    memory.add("assistant", reply_text)
     return reply_text
 
 
+async def stream_reply(messages: list, timings: dict, parts: list):
+    """
+    Stream a completion for `messages` from OpenAI and yield it sentence by sentence.
+
+    Records "first_token" and "done" (perf_counter seconds) in `timings`,
+    plus "messages" and, once the final chunk arrives, "usage" (prompt/
+    completion token counts); appends the raw text deltas to `parts`.
+    """
+    timings["messages"] = messages
+    stream = await client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    buffer = ""
+    async for chunk in stream:
+        if chunk.usage is not None:
+            timings["usage"] = chunk.usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content or ""
+        if not delta:
+            continue
+        timings.setdefault("first_token", time.perf_counter())
+        parts.append(delta)
+        sentences, buffer = pop_sentences(buffer + delta)
+        for sentence in sentences:
+            yield sentence
+    if buffer.strip():
+        yield buffer.strip()
+    timings["done"] = time.perf_counter()
+
+async def generate_response_stream(user_text: str, timings: dict):
+    """
+    Stream the reply to `user_text` (with memory) sentence by sentence.
+
+    If the consumer stops early, the partial reply is kept in memory.
+    """
+    messages = memory.messages(user_text)
+    memory.add("user", user_text)
+    parts = []
+    try:
+        async for sentence in stream_reply(messages, timings, parts):
+            yield sentence
+    finally:
+        # Also runs when a barge-in cancels the reply: keep what was generated.
+        if parts:
+            memory.add("assistant", "".join(parts))
+
+
+class Speculation:
+    """
+    Reply generated ahead of end of speech from a stable partial transcript.
+
+    Waits for the given chunk transcriptions, then for `speculate_ms` more
+    (the capture stage cancels it if another chunk arrives meanwhile), then
+    streams a reply into a buffer without touching `memory`. `commit()`
+    replays and continues that reply as if it had been started normally.
+    """
+
+    def __init__(self, chunks: list):
+        self.text = None
+        self.started = None
+        self.memory_version = None
+        self.timings = {}
+        self.parts = []
+        self.prefetched = {}  # sentence -> Clip being synthesized (first sentence, if speculate_tts)
+        self.sentences = asyncio.Queue()
+        self.task = asyncio.ensure_future(self._run(chunks))
+
+    async def _run(self, chunks: list):
+        try:
+            # Shielded: cancelling us must not cancel the STT the final transcript needs.
+            texts = await asyncio.gather(*map(asyncio.shield, chunks), return_exceptions=True)
+            if any(isinstance(t, BaseException) for t in texts):
+                return  # a chunk failed: leave the turn to the normal path
+            await asyncio.sleep(speculate_ms / 1000)
+            self.text = " ".join(t.strip() for t in texts if t)
+            if not self.text:
+                return
+            self.started = time.perf_counter()
+            self.memory_version = memory.version
+            print("🔮 Speculating on:", self.text)
+            messages = memory.messages(self.text)
+            async for sentence in stream_reply(messages, self.timings, self.parts):
+                if speculate_tts and not self.prefetched:
+                    self.prefetched[sentence] = start_speech(sentence)
+                self.sentences.put_nowait(sentence)
+        finally:
+            self.sentences.put_nowait(None)
+
+    def matches(self, final_text: str) -> bool:
+        """True if the reply was started for this exact transcript and memory state."""
+        return (self.started is not None and self.memory_version == memory.version
+                and self.text.split() == final_text.split())
+
+    def cancel(self):
+        self.task.cancel()
+        for clip in self.prefetched.values():
+            clip.cancel()
+
+    async def commit(self):
+        """Adopt the speculative reply: record it in memory and yield its sentences."""
+        memory.add("user", self.text)
+        try:
+            while (sentence := await self.sentences.get()) is not None:
+                yield sentence
+        finally:
+            self.task.cancel()  # no-op unless the consumer stopped early (barge-in)
+            if self.parts:
+                memory.add("assistant", "".join(self.parts))
+
+
 # -----------------------------
 # TTS
 # -----------------------------
-def speak_text(text: str, speaker: str = "Majd", dialect: str = "egy"):
+def _tts_request(text: str, speaker: str, dialect: str) -> dict:
     payload = {
         "text": text,
         "speaker": speaker,
@@ -179,51 +344,481 @@ def speak_text(text: str, speaker: str = "Majd", dialect: str = "egy"):
         "mulaw": False
     }
     headers = {"Authorization": f"Token {TTS_API_KEY}", "Content-Type": "application/json"}
-    resp = requests.post(TTS_URL, json=payload, headers=headers)
+    return {"json": payload, "headers": headers}
 
-    if resp.status_code == 200:
-        # Try JSON with base64 first; fallback to raw audio
-        audio_data = None
-        try:
-            result = resp.json()
-            if "audioBase64" in result:
-                audio_data = base64.b64decode(result["audioBase64"])
-        except ValueError:
-            audio_data = resp.content
-
-        if not audio_data:
-            print("Unexpected TTS response format:", resp.text[:200])
-            return
-
-        sound = pygame.mixer.Sound(io.BytesIO(audio_data))
-        sound.play()
-        while pygame.mixer.get_busy():
-            pygame.time.Clock().tick(10)
-        print("🔊 TTS played successfully.")
-    else:
+def _tts_audio(resp) -> bytes | None:
+    """Extract audio bytes from a TTS response (JSON base64 or raw audio)."""
+    if resp.status_code != 200:
         print("TTS Error:", resp.text)
+        return None
+
+    # Try JSON with base64 first; fallback to raw audio
+    audio_data = None
+    try:
+        result = resp.json()
+        if "audioBase64" in result:
+            audio_data = base64.b64decode(result["audioBase64"])
+    except ValueError:
+        audio_data = resp.content
+
+    if not audio_data:
+        print("Unexpected TTS response format:", resp.text[:200])
+    return audio_data
+
+async def synthesize_async(text: str, speaker: str = "Majd", dialect: str = "egy") -> bytes | None:
+    resp = await http_client.apost(TTS_URL, **_tts_request(text, speaker, dialect))
+    return _tts_audio(resp)
+
+async def stream_tts(text: str, clip: Clip, speaker: str = "Majd", dialect: str = "egy"):
+    """Stream TTS audio for `text` into `clip`, so playback can start on the first bytes."""
+    try:
+        async with http_client.get_async_client().stream(
+                "POST", TTS_URL, **_tts_request(text, speaker, dialect)) as resp:
+            if resp.status_code != 200:
+                await resp.aread()
+                print("TTS Error:", resp.text)
+                return
+            await astream_to_clip(resp, clip)
+    finally:
+        clip.finish()
+
+def start_speech(text: str, speaker: str = "Majd", dialect: str = "egy") -> Clip:
+    """Start streaming TTS for `text` into a new clip (not queued for playback yet)."""
+    clip = output.clip()
+    clip.source = asyncio.ensure_future(stream_tts(text, clip, speaker, dialect))
+    return clip
+
+def speak_text(text: str, speaker: str = "Majd", dialect: str = "egy"):
+    clip = output.enqueue(output.clip())
+    with http_client.get_client().stream("POST", TTS_URL, **_tts_request(text, speaker, dialect)) as resp:
+        if resp.status_code != 200:
+            resp.read()
+            print("TTS Error:", resp.text)
+            clip.finish()
+            return
+        stream_to_clip(resp, clip)  # plays while the body is still downloading
+    clip.done.wait()
+    print("🔊 TTS played successfully.")
+
+# Short acknowledgements per dialect, played while a slow answer is prepared.
+FILLER_PHRASES = {
+    "egy": ["لحظة من فضلك", "ثانية واحدة", "تمام، خليني أشوف"],
+    "msa": ["لحظة من فضلك", "حسناً، دعني أتحقق", "ثانية واحدة"],
+}
+
+class FillerBank:
+    """
+    Filler phrases for one speaker/dialect, synthesized once at startup and
+    held as decoded 16 kHz PCM, so playing one needs no TTS round trip.
+
+    Loading keeps at most `max_bytes` of PCM and gives up on phrases not
+    synthesized within `budget_s` seconds.
+    """
+
+    def __init__(self, speaker: str = "Majd", dialect: str = "egy",
+                 max_bytes: int = filler_max_bytes, budget_s: float = filler_startup_s):
+        self.speaker = speaker
+        self.dialect = dialect
+        self.phrases = FILLER_PHRASES.get(dialect, FILLER_PHRASES["msa"])
+        self.max_bytes = max_bytes
+        self.budget_s = budget_s
+        self.clips = []
+        self.size = 0
+        self._next = 0
+
+    async def load(self):
+        start = time.perf_counter()
+        tasks = [asyncio.ensure_future(synthesize_async(phrase, self.speaker, self.dialect))
+                 for phrase in self.phrases]
+        done, pending = await asyncio.wait(tasks, timeout=self.budget_s)
+        for task in pending:
+            task.cancel()
+        for phrase, task in zip(self.phrases, tasks):
+            if task not in done or task.exception() is not None or not task.result():
+                continue
+            try:
+                pcm = normalize_to_pcm16(task.result(), samplerate)
+            except ValueError as e:
+                print(f"Filler '{phrase}' skipped: {e}")
+                continue
+            if self.size + pcm.nbytes > self.max_bytes:
+                break
+            self.clips.append(pcm)
+            self.size += pcm.nbytes
+        print(f"🗣️ Filler bank {self.speaker}/{self.dialect}: {len(self.clips)}/{len(self.phrases)} phrases, "
+              f"{self.size / 1024:.0f} KiB, loaded in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def next(self) -> np.ndarray | None:
+        """Next clip, round-robin; None if the bank is empty."""
+        if not self.clips:
+            return None
+        pcm = self.clips[self._next % len(self.clips)]
+        self._next += 1
+        return pcm
 
 
 # -----------------------------
 # Conversation loop with VAD
 # -----------------------------
-async def live_conversation():
+def report_latency(ttfa: float | None, timings: dict, turn_start: float):
+    """Print time-to-first-audio against when the full completion was ready."""
+    if ttfa is None or "done" not in timings:
+        return
+    done = max(0.0, timings["done"] - turn_start)  # speculative replies may finish before the turn starts
+    # Without pipelining, audio could not start before the whole completion
+    # existed (and then a full-answer TTS round trip on top of that).
+    print(f"⏱️ Time-to-first-audio {ttfa * 1000:.0f} ms | LLM completion at {done * 1000:.0f} ms "
+          f"| saved ≥ {max(0.0, done - ttfa) * 1000:.0f} ms vs. sequential")
+
+def is_farewell(user_text: str) -> bool:
+    user_l = user_text.strip().lower()
+    return ("bye" in user_l) or ("باي" in user_l) or ("مع السلامة" in user_l)
+
+
+# -----------------------------
+# Pipeline stages
+# -----------------------------
+class Conversation:
+    """
+    Shared state for barge-in.
+
+    Every turn carries the `epoch` it was captured in. A barge-in bumps the
+    epoch, stops playback and cancels the reply's generation and synthesis;
+    stages then drop anything left over from older epochs.
+    """
+
+    def __init__(self):
+        self.epoch = 0
+        self.active = None          # turn whose reply is being generated/played
+        self.generation = None      # task streaming the active reply from the LLM
+        self.synth = set()          # in-flight TTS tasks
+        self.barge_ins = []         # detection -> playback stopped, seconds
+        self.spec_hits = []         # seconds each committed speculation started early
+        self.spec_misses = 0
+        self.fillers = None         # FillerBank, if enabled
+        self.playback = None        # playback stage's queue, for fillers
+        self.expected_latency = None  # EMA of end-of-speech -> first reply audio, seconds
+        self.fillers_played = 0
+
+    def is_stale(self, turn: dict) -> bool:
+        return turn["epoch"] != self.epoch
+
+    def barge_in(self, detected_at: float):
+        """User started talking (called on the loop when the VAD fires)."""
+        if self.active is None:
+            return
+        turn, self.active = self.active, None
+        self.epoch += 1
+        output.stop()
+        if self.generation is not None:
+            self.generation.cancel()
+        for task in list(self.synth):
+            task.cancel()
+        reaction = time.perf_counter() - detected_at
+        self.barge_ins.append(reaction)
+        print(f"✋ Barge-in on turn #{turn['id']}: playback stopped {reaction * 1000:.0f} ms after detection "
+              f"(~{reaction * 1000 + barge_in_ms:.0f} ms after speech onset)")
+
+    def commit(self, spec: Speculation, turn_start: float):
+        saved = turn_start - spec.started
+        self.spec_hits.append(saved)
+        print(f"🔮 Speculation hit: reply started {saved * 1000:.0f} ms before the final transcript")
+
+    def discard(self, spec: Speculation | None):
+        if spec is None:
+            return
+        spec.cancel()
+        if spec.started is not None:
+            self.spec_misses += 1
+            print("🔮 Speculation discarded")
+
+    def observe_latency(self, seconds: float):
+        if self.expected_latency is None:
+            self.expected_latency = seconds
+        else:
+            self.expected_latency += 0.3 * (seconds - self.expected_latency)
+
+    def offer_filler(self, turn: dict):
+        """
+        Queue a filler ahead of `turn`'s reply if the agent is idle and the
+        reply is predicted to take longer than `filler_threshold_ms` (always
+        assumed before the first turn has been measured).
+        """
+        if self.fillers is None or self.active is not None or not self.playback.empty():
+            return
+        if self.expected_latency is not None and self.expected_latency * 1000 <= filler_threshold_ms:
+            return
+        pcm = self.fillers.next()
+        if pcm is None:
+            return
+        clip = output.clip()
+        clip.write(pcm)
+        clip.finish()
+        turn["filler"] = clip
+        self.playback.put_nowait((turn, clip))
+
+    def report(self):
+        if self.fillers is not None:
+            expected = f"{self.expected_latency * 1000:.0f} ms" if self.expected_latency is not None else "n/a"
+            print(f"🗣️ Fillers played: {self.fillers_played} | expected response latency {expected}")
+        total = len(self.spec_hits) + self.spec_misses
+        if total:
+            saved = sum(self.spec_hits) / len(self.spec_hits) if self.spec_hits else 0.0
+            print(f"🔮 Speculation: {len(self.spec_hits)}/{total} hits ({len(self.spec_hits) / total:.0%}) "
+                  f"| saved avg {saved * 1000:.0f} ms per hit")
+        if self.barge_ins:
+            avg = sum(self.barge_ins) / len(self.barge_ins)
+            print(f"✋ Barge-ins: {len(self.barge_ins)} | reaction avg {avg * 1000:.0f} ms "
+                  f"| max {max(self.barge_ins) * 1000:.0f} ms")
+
+class Stage:
+    """Per-stage latency and input queue depth, printed after every turn."""
+
+    def __init__(self, name: str, inbox: asyncio.Queue = None):
+        self.name = name
+        self.inbox = inbox
+        self.count = 0
+        self.total = 0.0
+        self.last = 0.0
+
+    def record(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+
+    def __str__(self):
+        depth = f" q={self.inbox.qsize()}/{self.inbox.maxsize}" if self.inbox is not None else ""
+        avg = self.total / self.count if self.count else 0.0
+        return f"{self.name}{depth} last={self.last * 1000:.0f}ms avg={avg * 1000:.0f}ms"
+
+async def capture_stage(mic: MicCapture, out: asyncio.Queue, stage: Stage, conv: Conversation):
+    """
+    Endpointed utterances from the always-on mic -> turns.
+
+    With `stt_streaming`, each chunk's transcription starts as soon as the
+    chunk is cut, and the turn carries those tasks (plus any `Speculation`
+    on them); otherwise it carries the whole utterance as WAV.
+    """
+    turn_id = 0
+    pending = []  # STT tasks for chunks of the utterance still being spoken
+    speculation = None
+    start = time.perf_counter()
     while True:
-        wav_bytes = record_audio_continuous()  # Returns in-memory WAV bytes
-        user_text = transcribe_audio_bytes(wav_bytes)  # Send directly to STT
-        if not user_text:
+        # Short timeouts so cancellation never waits on a parked worker thread for long.
+        if stt_streaming:
+            item = await asyncio.to_thread(mic.next_chunk, 0.5)
+            if item is None:
+                continue
+            pcm, final = item
+            if len(pcm):
+                pending.append(asyncio.ensure_future(transcribe_chunk(pcm)))
+                if not final:
+                    # The user kept talking: whatever was speculated is out of date.
+                    conv.discard(speculation)
+                    speculation = Speculation(list(pending)) if speculate else None
+            if not final:
+                continue
+            turn = {"chunks": pending, "speculation": speculation}
+            pending, speculation = [], None
+            detail = f"{len(turn['chunks'])} chunks"
+        else:
+            audio = await asyncio.to_thread(mic.next_utterance, 0.5)
+            if audio is None:
+                continue
+            turn = {"wav": pcm_frames_to_wav_bytes(audio, samplerate)}
+            detail = f"{len(audio) * 1000 // samplerate} ms"
+        stage.record(time.perf_counter() - start)
+        turn_id += 1
+        turn.update(id=turn_id, epoch=conv.epoch, endpoint=time.perf_counter())
+        print(f"🛑 End of speech #{turn_id} ({detail})")
+        await out.put(turn)
+        start = time.perf_counter()
+
+async def stt_stage(inbox: asyncio.Queue, out: asyncio.Queue, stage: Stage, conv: Conversation):
+    """
+    Turn audio into text. Streamed turns only wait for their last chunk(s),
+    so the delay after end of speech does not grow with utterance length.
+
+    Turns with an empty transcript (noise, a cough) are dropped here, so a
+    filler is only offered once there is something to answer.
+    """
+    while True:
+        turn = await inbox.get()
+        start = time.perf_counter()
+        if "chunks" in turn:
+            texts = await asyncio.gather(*turn.pop("chunks"), return_exceptions=True)
+            for error in (t for t in texts if isinstance(t, Exception)):
+                print(f"STT Error: chunk dropped: {error!r}")
+            text = " ".join(t.strip() for t in texts if isinstance(t, str) and t)
+            delay = time.perf_counter() - turn["endpoint"]
+            print(f"📝 Final transcript {delay * 1000:.0f} ms after end of speech")
+            stage.record(delay)
+        else:
+            text = await transcribe_audio_async(turn.pop("wav"))
+            stage.record(time.perf_counter() - start)
+        if not text:
+            conv.discard(turn.pop("speculation", None))
             continue
+        print("User said:", text)
+        turn["text"] = text
+        conv.offer_filler(turn)
+        await out.put(turn)
 
-        print("User said:", user_text)
+async def llm_stage(inbox: asyncio.Queue, out: asyncio.Queue, stage: Stage, conv: Conversation):
+    """Stream each reply into (turn, sentence) items, then a (turn, None) end marker."""
+    while True:
+        turn = await inbox.get()
+        spec = turn.pop("speculation", None)
+        if conv.is_stale(turn):
+            conv.discard(spec)
+            continue  # spoken before a barge-in that has since superseded it
+        turn["start"] = time.perf_counter()
+        if spec is not None and spec.matches(turn["text"]):
+            conv.commit(spec, turn["start"])
+            turn["timings"] = spec.timings
+            turn["prefetched"] = spec.prefetched
+            replies = spec.commit()
+        else:
+            conv.discard(spec)
+            turn["timings"] = {}
+            replies = generate_response_stream(turn["text"], turn["timings"])
+
+        async def generate():
+            async with contextlib.aclosing(replies):
+                async for sentence in replies:
+                    print("Agent:", sentence)
+                    await out.put((turn, sentence))
+
+        conv.active = turn
+        conv.generation = asyncio.ensure_future(generate())
+        await asyncio.wait([conv.generation])
+        if not conv.generation.cancelled() and conv.generation.exception() is not None:
+            raise conv.generation.exception()
+        conv.generation = None
+        await out.put((turn, None))
+        stage.record(time.perf_counter() - turn["start"])
+
+async def tts_stage(inbox: asyncio.Queue, out: asyncio.Queue, stage: Stage, conv: Conversation):
+    """
+    Start streaming synthesis of each sentence into a clip and pass the clips on in order.
+
+    `out` is bounded by `tts_parallel`, which caps how far synthesis runs
+    ahead of playback.
+    """
+    while True:
+        turn, sentence = await inbox.get()
+        clip = None
+        if sentence is not None:
+            if conv.is_stale(turn):
+                continue
+            clip = turn.get("prefetched", {}).pop(sentence, None)
+            if clip is None:
+                start = time.perf_counter()
+                clip = start_speech(sentence)
+                clip.source.add_done_callback(lambda _, start=start: stage.record(time.perf_counter() - start))
+            conv.synth.add(clip.source)
+            clip.source.add_done_callback(conv.synth.discard)
+        await out.put((turn, clip))
+
+async def playback_stage(inbox: asyncio.Queue, stage: Stage, stages: list, conv: Conversation):
+    """
+    Hand clips to the output engine in order; returns when the user says goodbye.
+
+    The next clip is queued while the current one plays, so sentences play
+    back to back, each starting as soon as its first TTS bytes arrive.
+    """
+    playing = None
+    while True:
+        turn, clip = await inbox.get()
+        if clip is None:
+            clips = turn.pop("clips", [])
+            if clips:
+                await clips[-1].wait()
+            playing = None
+            if conv.is_stale(turn):
+                print(f"⏹️ Turn #{turn['id']} interrupted")
+                continue
+            conv.active = None
+            started = [c.started_at for c in clips if c.started_at is not None]
+            if started:
+                turn["first_audio"] = started[0] - turn["start"]
+                conv.observe_latency(started[0] - turn["endpoint"])
+            report_latency(turn.get("first_audio"), turn["timings"], turn["start"])
+            if "messages" in turn["timings"]:
+                memory.record(turn["timings"]["messages"], turn["timings"].get("usage"))
+                print("🧠 " + memory.stats())
+            print("📊 " + " | ".join(str(s) for s in stages) + f" | output {output.stats()}")
+            if is_farewell(turn["text"]):
+                print("👋 Conversation ended after AI reply.")
+                return
+            continue
+        if conv.is_stale(turn):
+            clip.cancel()
+            continue
+        output.enqueue(clip)
+        if clip is turn.get("filler"):
+            conv.fillers_played += 1
+        else:
+            turn.setdefault("clips", []).append(clip)
+        if playing is not None:
+            await playing.wait()
+            if playing.started_at is not None:
+                stage.record(time.perf_counter() - playing.started_at)
+        playing = clip
 
-        answer = await generate_response(user_text)
-        print("Agent Response:", answer)
-        speak_text(answer)
+async def live_conversation():
+    """
+    Run capture -> STT -> LLM -> TTS -> playback as concurrent stages joined
+    by bounded queues, so the next utterance can be captured and transcribed
+    while the current answer is still being generated and played.
+
+    With `barge_in` on, the mic's speech onset interrupts the current answer
+    (see `Conversation.barge_in`). Use a headset or an echo-cancelling
+    device, or the agent's own voice will interrupt it.
+    """
+    utterances = asyncio.Queue(queue_size)
+    transcripts = asyncio.Queue(queue_size)
+    sentences = asyncio.Queue(queue_size)
+    audio = asyncio.Queue(tts_parallel)
+    stages = [Stage("capture"), Stage("stt", utterances), Stage("llm", transcripts),
+              Stage("tts", sentences), Stage("playback", audio)]
+    capture, stt, llm, tts, playback = stages
+    conv = Conversation()
+    conv.playback = audio
+    if fillers:
+        conv.fillers = FillerBank()
+        await conv.fillers.load()
+
+    on_speech = None
+    if barge_in:
+        loop = asyncio.get_running_loop()
+        # Called on the VAD consumer thread; hop onto the loop with the detection time.
+        on_speech = lambda: loop.call_soon_threadsafe(conv.barge_in, time.perf_counter())
 
-        user_l = user_text.strip().lower()
-        if ("bye" in user_l) or ("باي" in user_l) or ("مع السلامة" in user_l):
-            print("👋 Conversation ended after AI reply.")
-            break
+    print("🎙️ Listening... start speaking")
+    mic = MicCapture(endpointer, on_speech=on_speech, speech_ms=barge_in_ms,
+                     chunk_pause_ms=chunk_pause_ms if stt_streaming else None,
+                     min_chunk_ms=min_chunk_ms, max_chunk_ms=max_chunk_ms)
+    with mic:
+        workers = [
+            asyncio.ensure_future(capture_stage(mic, utterances, capture, conv)),
+            asyncio.ensure_future(stt_stage(utterances, transcripts, stt, conv)),
+            asyncio.ensure_future(llm_stage(transcripts, sentences, llm, conv)),
+            asyncio.ensure_future(tts_stage(sentences, audio, tts, conv)),
+            asyncio.ensure_future(playback_stage(audio, playback, stages, conv)),
+        ]
+        try:
+            # Playback returns on goodbye; any other stage finishing means it failed.
+            done, _ = await asyncio.wait(workers, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        for worker in done:
+            worker.result()
+    print("🎙️ Capture health:", mic.stats())
+    conv.report()
+    memory.report()
 
 
 # -----------------------------
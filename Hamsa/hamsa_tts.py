@@ -33,7 +33,8 @@ This script demonstrates how to send text to a Text-to-Speech (TTS) service (Ham
 This code effectively integrates TTS functionality with Pygame for speech playback, allowing real-time generation and playback of speech from text.
 """
 
-import requests
+import core_path  # noqa: F401  (puts the shared audio_core/http_client on sys.path)
+import http_client
 import pygame
 import io
 
@@ -55,7 +56,7 @@ headers = {
 }
 
 # Sending the POST request to the TTS API
-response = requests.post(url, json=payload, headers=headers)
+response = http_client.post(url, json=payload, headers=headers)
 
 # Check if the response is OK
 if response.status_code == 200:
@@ -2,8 +2,8 @@
 Simple speech demo that records short clips (5s), sends them to Hamsa STT, asks OpenAI for a reply, and plays the answer via Hamsa TTS. Core pieces:
 - `convert_audio_to_base64`: normalize WAV to 16 kHz mono and return Base64.
 - `transcribe_audio`: call Hamsa STT with the Base64 audio.
-- `generate_response`: async OpenAI chat with running history.
-- `speak_text`: call Hamsa TTS and play with pygame.
+- `generate_response`: async OpenAI chat with bounded history (`memory.py`: recent turns within a token budget plus a running summary of older ones); prints each turn's prompt tokens.
+- `speak_text`: call Hamsa TTS and stream the answer into a persistent sounddevice output (`playback.py`).
 - `record_audio`: fixed-duration mic capture (no VAD).
 - `live_conversation`: loop until user says bye.
 
@@ -12,18 +12,18 @@ Simple speech demo that records short clips (5s), sends them to Hamsa STT, asks
 import sounddevice as sd
 import wave
 import io
-import requests
-import pygame
+import core_path  # noqa: F401  (puts the shared audio_core/http_client on sys.path)
+import http_client
 import io
-import base64
 import wave
-import numpy as np
-from pydub import AudioSegment
 import os
 import asyncio
 from openai import AsyncOpenAI
 import sounddevice as sd
 from dotenv import load_dotenv
+from audio_core import wav_to_base64
+from playback import AudioOutput, stream_to_clip
+from memory import ConversationMemory
 
 load_dotenv()
 
@@ -39,34 +39,17 @@ TTS_URL = "https://api.tryhamsa.com/v1/realtime/tts"
 STT_API_KEY = os.getenv("STT_API_KEY")
 TTS_API_KEY = os.getenv("TTS_API_KEY")
 
+# Persistent output stream, opened on first playback and reused afterwards
+output = AudioOutput()
+
 # -----------------------------
 # Convert audio file to Base64 PCM WAV
 # -----------------------------
 def convert_audio_to_base64(audio_input):
     try:
-        # If audio_input is bytes, wrap in BytesIO
-        if isinstance(audio_input, (bytes, bytearray)):
-            buf = io.BytesIO(audio_input)
-            audio = AudioSegment.from_wav(buf)
-        else:
-            # Otherwise assume it's a filename
-            audio = AudioSegment.from_wav(audio_input)
-
-        # Normalize to mono, 16‑bit, 16kHz
-        audio = audio.set_channels(1).set_sample_width(2).set_frame_rate(16000)
-        raw_audio_data = np.array(audio.get_array_of_samples())
-
-        # Write to memory instead of disk
-        buf_out = io.BytesIO()
-        with wave.open(buf_out, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)
-            wf.setframerate(16000)
-            wf.writeframes(raw_audio_data.tobytes())
-        buf_out.seek(0)
-
-        audio_bytes = buf_out.read()
-        return base64.b64encode(audio_bytes).decode("utf-8")
+        # Accepts WAV bytes or a filename; 16 kHz mono 16-bit input is passed
+        # through untouched, anything else is normalized in NumPy.
+        return wav_to_base64(audio_input)
     except Exception as e:
         print(f"Error converting audio: {e}")
         return None
@@ -85,7 +68,7 @@ def transcribe_audio(audio_input):
         "eosThreshold": 0.3
     }
     headers = {"Authorization": f"Token {STT_API_KEY}", "Content-Type": "application/json"}
-    response = requests.post(STT_URL, json=payload, headers=headers)
+    response = http_client.post(STT_URL, json=payload, headers=headers)
     if response.status_code == 200:
         result = response.json()
         print("STT Result:", result)
@@ -97,24 +80,31 @@ def transcribe_audio(audio_input):
 # -----------------------------
 # Generate Response
 # -----------------------------
-# Keep history outside the function so it persists across calls
-history = [{"role": "system", "content": "You are a helpful AI call assistant."}]
+# Keep history outside the function so it persists across calls; old turns
+# are summarized so the prompt stays within budget on long conversations.
+memory = ConversationMemory(
+    client,
+    "You are a helpful AI call assistant.",
+    max_tokens=1500,
+)
 
 async def generate_response(user_text: str) -> str:
-    # Add user message to history
-    history.append({"role": "user","message":"you are a helpful assistant, reply naturally according to the user's language and dialect", "content": user_text})
+    messages = memory.messages(user_text)
 
     # Call OpenAI asynchronously
     response = await client.chat.completions.create(
         model="gpt-4o-mini",  # or another model you prefer
-        messages=history
+        messages=messages
     )
 
     # Extract assistant reply
     reply_text = response.choices[0].message.content
 
-    # Add assistant reply to history
-    history.append({"role": "assistant", "content": reply_text})
+    # Add both sides to memory (may summarize older turns in the background)
+    memory.record(messages, response.usage)
+    memory.add("user", user_text)
+    memory.add("assistant", reply_text)
+    print("🧠", memory.stats())
 
 
     return reply_text
@@ -131,30 +121,21 @@ def speak_text(text, speaker="Majd", dialect="egy"):
     }
     headers = {"Authorization": f"Token {TTS_API_KEY}", "Content-Type": "application/json"}
 
-    response = requests.post(TTS_URL, json=payload, headers=headers)
-
-    if response.status_code == 200:
+    clip = output.enqueue(output.clip())
+    with http_client.get_client().stream("POST", TTS_URL, json=payload, headers=headers) as response:
+        if response.status_code != 200:
+            response.read()
+            clip.finish()
+            print("TTS Error:", response.text)
+            return
         try:
-            # Try to parse JSON first
-            result = response.json()
-            if "audioBase64" in result:
-                audio_data = base64.b64decode(result["audioBase64"])
-            else:
-                print("Unexpected JSON:", result)
-                return
-        except Exception:
-            # If not JSON, assume raw audio bytes
-            audio_data = response.content
-
-        # Initialize mixer with correct sample rate
-        pygame.mixer.init(frequency=16000)
-        sound = pygame.mixer.Sound(io.BytesIO(audio_data))
-        sound.play()
-        while pygame.mixer.get_busy():
-            pygame.time.Clock().tick(10)
-        print("TTS played successfully.")
-    else:
-        print("TTS Error:", response.text)
+            # Plays through the persistent output stream while the body downloads
+            stream_to_clip(response, clip)
+        except ValueError as e:
+            print("Unexpected TTS response:", e)
+            return
+    clip.done.wait()
+    print("TTS played successfully.")
 
 
 # -----------------------------
@@ -206,6 +187,7 @@ async def live_conversation():
         if any(kw in user_text.strip().lower() for kw in ["bye", "باي", "مع السلامة"]):
             print("👋 Conversation ended after AI reply.")
             break
+    memory.report()
 
 
 # -----------------------------
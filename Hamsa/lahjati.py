@@ -1,8 +1,22 @@
+"""
+Lahajati TTS demo with progressive playback.
+
+The MP3 response is piped into ffmpeg as it arrives and the decoded 16 kHz
+PCM is fed straight into the persistent output stream from `playback.py`,
+so audio starts after the first MP3 frames instead of after the whole body.
+`python lahjati.py --compare` also runs the old buffered path (download
+everything, decode, then play) and prints time-to-first-audio for both.
+"""
+
 import os
-import requests
-import pyaudio
 import subprocess
-from io import BytesIO
+import sys
+import threading
+import time
+import numpy as np
+import core_path  # noqa: F401  (puts the shared audio_core/http_client on sys.path)
+import http_client
+from playback import AudioOutput, Clip
 
 # Set your Lahajati API key and other parameters
 API_KEY = "sk_eyJpdiI6Im91ajh4TDI3ZUt0YlZaUTFiRGJxRnc9PSIsInZhbHVlIjoiMDN3bHd2Nkd3VE5ZelpUTnVGY1VVaG9TVjFZaE9pRGRiVitZRXBJZzk3bGRkc0RzYld0SFZyQUk2cGtwNUZhdCIsIm1hYyI6ImE5NTVkOTA4ZTMyNzk3ZDlmZDlmNGYyODIxZjQ0MDRjNzM2NDJlM2U4YTUyOTFiYzExYzZlNzQxMjE3MTRhZDgiLCJ0YWciOiIifQ=="
@@ -12,28 +26,120 @@ DIALECT_ID = "10"  # Example: replace with your valid dialect ID
 
 API_URL = "https://lahajati.ai/api/v1/text-to-speech-absolute-control"
 
-# Function to play audio directly using pyaudio
-def play_audio(audio_data):
-    p = pyaudio.PyAudio()
-    stream = p.open(format=pyaudio.paInt16,
-                    channels=1,
-                    rate=16000,  # Ensure the sample rate is 16 kHz
-                    output=True)
-    
-    # Write audio to stream
-    stream.write(audio_data)
-    stream.stop_stream()
-    stream.close()
-    p.terminate()
+SAMPLE_RATE = 16000
+READ_BLOCK = 4096  # bytes of PCM handed to the output per read (~128 ms)
+
+
+class Mp3Decoder:
+    """
+    Streaming MP3 -> int16 16 kHz mono decoder backed by ffmpeg.
+
+    ffmpeg is told the input format up front and not to probe or buffer, so
+    PCM comes out as soon as the first MP3 frames go in. One process is
+    spawned ahead of time and a replacement is started in the background
+    whenever it is taken, so process start-up never sits between the first
+    HTTP bytes and the first audio. Each utterance gets its own process:
+    closing stdin is what makes ffmpeg flush the decoder's tail. After
+    `close()` no spare is started, and any that was waiting is killed.
+    """
+
+    CMD = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin",
+           "-probesize", "32", "-analyzeduration", "0", "-fflags", "nobuffer",
+           "-f", "mp3", "-i", "pipe:0",
+           "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-ac", "1",
+           "-flush_packets", "1", "pipe:1"]
+
+    def __init__(self):
+        self._spare = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self.prewarm()
+
+    def _spawn(self) -> subprocess.Popen:
+        return subprocess.Popen(self.CMD, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, bufsize=0)
+
+    def prewarm(self):
+        """Make sure a decoder process is waiting for the next utterance."""
+        with self._lock:
+            if self._closed:
+                return  # a prewarm thread that lost the race with close()
+            if self._spare is None or self._spare.poll() is not None:
+                self._spare = self._spawn()
+
+    def _take(self) -> subprocess.Popen:
+        with self._lock:
+            proc, self._spare = self._spare, None
+            closed = self._closed
+        if proc is None or proc.poll() is not None:
+            proc = self._spawn()
+        if not closed:
+            threading.Thread(target=self.prewarm, daemon=True).start()
+        return proc
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            proc, self._spare = self._spare, None
+        if proc is not None:
+            proc.kill()
+            proc.wait()
+
+    def decode_into(self, chunks, clip: Clip):
+        """
+        Feed MP3 byte chunks to ffmpeg and write the decoded PCM into `clip`.
+
+        Returns once everything is decoded; the clip is finished either way.
 
-# Function to send text to Lahajati and get the TTS audio response, playing it in real time
-def text_to_speech_real_time(text: str):
+        Raises:
+            RuntimeError: If ffmpeg exits with an error.
+        """
+        proc = self._take()
+        reader = threading.Thread(target=self._pump, args=(proc, clip), daemon=True)
+        reader.start()
+        try:
+            for chunk in chunks:
+                if chunk:
+                    proc.stdin.write(chunk)
+        except BrokenPipeError:
+            pass  # ffmpeg gave up; its stderr says why
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+            reader.join()
+            errors = proc.stderr.read().decode(errors="replace").strip()
+            if proc.wait() != 0 and not clip.cancelled:
+                raise RuntimeError(f"ffmpeg failed ({proc.returncode}): {errors}")
+
+    @staticmethod
+    def _pump(proc: subprocess.Popen, clip: Clip):
+        fd = proc.stdout.fileno()
+        odd = b""
+        try:
+            while True:
+                data = os.read(fd, READ_BLOCK)  # returns whatever is ready, no waiting for a full block
+                if not data:
+                    break
+                data = odd + data
+                usable = len(data) & ~1
+                odd = data[usable:]
+                clip.write(np.frombuffer(data[:usable], dtype="<i2").copy())
+        finally:
+            clip.finish()
+
+
+output = AudioOutput(SAMPLE_RATE)
+decoder = None  # created on first use so importing this module does not start ffmpeg
+
+
+def _request_args(text: str, accept: str = "audio/mpeg"):
     headers = {
         "Authorization": f"Bearer {API_KEY}",
         "Content-Type": "application/json",
-        "Accept": "audio/mpeg"
+        "Accept": accept
     }
-    
     payload = {
         "text": text,
         "id_voice": VOICE_ID,
@@ -41,35 +147,78 @@ def text_to_speech_real_time(text: str):
         "performance_id": PERF_ID,
         "dialect_id": DIALECT_ID
     }
+    return headers, payload
+
+
+# Function to send text to Lahajati and play the TTS audio while it downloads
+def text_to_speech_real_time(text: str) -> float:
+    """
+    Speak `text` through Lahajati, decoding and playing the MP3 as it streams in.
+
+    Returns:
+        Time to first audio in seconds (request sent -> first sample played).
+    """
+    global decoder
+    if decoder is None:
+        decoder = Mp3Decoder()
+    headers, payload = _request_args(text)
 
-    # Send the request to the Lahajati API
     print("Sending request to Lahajati...")
-    resp = requests.post(API_URL, headers=headers, json=payload, stream=True)
+    started = time.perf_counter()
+    clip = output.enqueue(output.clip())
+    with http_client.get_client().stream("POST", API_URL, headers=headers, json=payload) as resp:
+        resp.raise_for_status()
+        decoder.decode_into(resp.iter_bytes(chunk_size=READ_BLOCK), clip)
+    clip.done.wait()
+    ttfa = (clip.started_at - started) if clip.started_at else float("nan")
+    print(f"Streaming: first audio after {ttfa * 1000:.0f} ms, "
+          f"{clip.played / SAMPLE_RATE:.2f} s played, {output.stats()}")
+    return ttfa
 
-    # Raise an exception if the request fails
-    resp.raise_for_status()
 
-    # Convert the MP3 response to WAV using ffmpeg (in-memory, no temporary files)
-    audio_data = b""
-    for chunk in resp.iter_content(chunk_size=8192):
-        if chunk:
-            audio_data += chunk
+# Previous implementation (download everything, convert, then play), kept to compare against
+def text_to_speech_buffered(text: str) -> float:
+    """
+    Speak `text` the old way: full download, one-shot ffmpeg, fresh PyAudio stream.
+
+    Returns:
+        Time to first audio in seconds (request sent -> playback start).
+    """
+    import pyaudio
+
+    headers, payload = _request_args(text)
+    started = time.perf_counter()
+    with http_client.get_client().stream("POST", API_URL, headers=headers, json=payload) as resp:
+        resp.raise_for_status()
+        audio_data = b"".join(resp.iter_bytes(chunk_size=8192))
 
-    # Use ffmpeg to convert the MP3 data to WAV in-memory via pipe, with 16kHz mono conversion
-    print("Converting MP3 to WAV in-memory using ffmpeg...")
     process = subprocess.Popen(
         ['ffmpeg', '-i', 'pipe:0', '-f', 'wav', '-ar', '16000', '-ac', '1', 'pipe:1'],
         stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
     )
-
-    # Pass the MP3 data to ffmpeg's stdin and get the WAV data from stdout
     wav_data, _ = process.communicate(input=audio_data)
 
-    # Play the converted WAV audio
-    print("Playing audio...")
-    play_audio(wav_data)
+    p = pyaudio.PyAudio()
+    stream = p.open(format=pyaudio.paInt16, channels=1, rate=16000, output=True)
+    ttfa = time.perf_counter() - started
+    stream.write(wav_data)
+    stream.stop_stream()
+    stream.close()
+    p.terminate()
+    print(f"Buffered: first audio after {ttfa * 1000:.0f} ms")
+    return ttfa
+
 
 # Example usage of the function
 if __name__ == "__main__":
     sample_text = "السلام عليكم، هذا اختبار للصوت الاصطناعي من لهجاتي."
-    text_to_speech_real_time(sample_text)
+    try:
+        streamed = text_to_speech_real_time(sample_text)
+        if "--compare" in sys.argv:
+            buffered = text_to_speech_buffered(sample_text)
+            print(f"TTFA: streaming {streamed * 1000:.0f} ms vs buffered {buffered * 1000:.0f} ms "
+                  f"({buffered - streamed:+.3f} s saved)")
+    finally:
+        if decoder is not None:
+            decoder.close()
+        output.close()
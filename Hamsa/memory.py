@@ -0,0 +1,144 @@
+"""
+Bounded conversation memory for the voice loops.
+
+The prompt sent every turn is the system prompt, a running summary of older
+turns, and a sliding window of the most recent messages. When the window
+exceeds its token budget (or `max_messages`), the oldest user/assistant
+exchanges are evicted and folded into the summary by a background LLM call,
+so prompt size stays flat however long the call runs.
+"""
+
+import asyncio
+import time
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")  # gpt-4o / gpt-4o-mini
+except Exception:  # not installed, or the encoding could not be fetched
+    _encoding = None
+
+# Per-message framing overhead of the chat format, in tokens.
+MESSAGE_OVERHEAD = 4
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a phone conversation between a user and an AI call assistant. "
+    "Keep names, numbers, requests, decisions and open questions; drop small talk. "
+    "Write it in the conversation's language, at most {words} words."
+)
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in `text` (tiktoken when installed, else ~3 characters per token)."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 2) // 3
+
+
+def message_tokens(messages: list) -> int:
+    """Estimated prompt tokens for a list of chat messages."""
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages) + 3
+
+
+class ConversationMemory:
+    """
+    System prompt + running summary + sliding window of recent turns.
+
+    `messages()` builds the prompt for the next request; `add()` records a
+    message and evicts old exchanges once the window is over `max_tokens`
+    or `max_messages`. Evicted exchanges are summarized on a background task
+    (the `summary_tokens` cap bounds the summary itself). `version` changes
+    whenever the prompt would change, so a reply prepared for one state can
+    tell whether it is still valid.
+    """
+
+    def __init__(self, client, system_prompt: str, model: str = "gpt-4o-mini",
+                 max_tokens: int = 1500, max_messages: int = 16, summary_tokens: int = 200):
+        self.client = client
+        self.model = model
+        self.system = {"role": "system", "content": system_prompt}
+        self.max_tokens = max_tokens
+        self.max_messages = max_messages
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.window = []
+        self.evicted = []          # exchanges waiting to be folded into the summary
+        self.version = 0
+        self.prompt_tokens = []    # per turn: (reported by the API or estimated, estimated)
+        self.summaries = 0
+        self._summarizer = None
+
+    def messages(self, user_text: str = None) -> list:
+        """Prompt for the next request, optionally ending with a not-yet-recorded user message."""
+        messages = [self.system]
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"})
+        messages.extend(self.window)
+        if user_text is not None:
+            messages.append({"role": "user", "content": user_text})
+        return messages
+
+    def add(self, role: str, content: str):
+        self.window.append({"role": role, "content": content})
+        self.version += 1
+        if role == "assistant":
+            self._evict()
+
+    def _evict(self):
+        # Only after an assistant reply, so a turn is never split mid-exchange.
+        # The newest exchange always stays.
+        while len(self.window) > 2 and (len(self.window) > self.max_messages
+                                        or message_tokens(self.messages()) > self.max_tokens):
+            cut = 1
+            while cut < len(self.window) - 2 and self.window[cut]["role"] != "user":
+                cut += 1
+            self.evicted.extend(self.window[:cut])
+            del self.window[:cut]
+        if self.evicted and (self._summarizer is None or self._summarizer.done()):
+            try:
+                self._summarizer = asyncio.get_running_loop().create_task(self._summarize())
+            except RuntimeError:
+                pass  # no loop (sync caller): folded in on the next add() inside one
+
+    async def _summarize(self):
+        while self.evicted:
+            batch, self.evicted = self.evicted, []
+            transcript = "\n".join(f"{m['role']}: {m['content']}" for m in batch)
+            prompt = f"Summary so far: {self.summary or '(none)'}\n\nNew exchanges:\n{transcript}"
+            start = time.perf_counter()
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": SUMMARY_PROMPT.format(words=self.summary_tokens // 2)},
+                        {"role": "user", "content": prompt},
+                    ],
+                    max_tokens=self.summary_tokens,
+                )
+            except Exception as e:
+                print(f"Summary update failed, {len(batch)} messages dropped: {e}")
+                continue
+            self.summary = (response.choices[0].message.content or "").strip()
+            self.version += 1
+            self.summaries += 1
+            print(f"🧠 Summarized {len(batch)} messages in {(time.perf_counter() - start) * 1000:.0f} ms "
+                  f"-> {count_tokens(self.summary)} tokens")
+
+    def record(self, messages: list, usage=None) -> int:
+        """Record the prompt size of one turn (`usage` from the API if available) and return it."""
+        estimated = message_tokens(messages)
+        tokens = getattr(usage, "prompt_tokens", None) or estimated
+        self.prompt_tokens.append((tokens, estimated))
+        return tokens
+
+    def stats(self) -> str:
+        last = f"{self.prompt_tokens[-1][0]} tokens" if self.prompt_tokens else "n/a"
+        return (f"prompt {last} | window {len(self.window)} msgs "
+                f"| summary {count_tokens(self.summary)} tokens")
+
+    def report(self):
+        """Print how prompt size evolved over the call (flat means memory is bounded)."""
+        if not self.prompt_tokens:
+            return
+        tokens = [t for t, _ in self.prompt_tokens]
+        print(f"🧠 Prompt tokens over {len(tokens)} turns: first {tokens[0]} | last {tokens[-1]} "
+              f"| max {max(tokens)} | avg {sum(tokens) / len(tokens):.0f} | summaries {self.summaries}")
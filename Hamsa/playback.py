@@ -0,0 +1,284 @@
+"""
+Persistent audio output for the Hamsa voice scripts.
+
+- `AudioOutput`: one long-lived sounddevice OutputStream that plays `Clip`s
+  back to back. A clip starts once `jitter_ms` of it is buffered (or it is
+  complete) and signals completion through events instead of polling.
+- `Clip`: PCM written by a producer while it plays, e.g. straight from a
+  streaming TTS response (`stream_to_clip` / `astream_to_clip`).
+- `WavStream`: incremental WAV body -> int16 samples decoder.
+"""
+
+import asyncio
+import base64
+import collections
+import json
+import threading
+import time
+import sounddevice as sd
+import numpy as np
+import core_path  # noqa: F401  (puts the shared audio_core/http_client on sys.path)
+from audio_core import TARGET_RATE, is_target_format, normalize_to_pcm16, parse_wav_header
+
+
+class Clip:
+    """
+    A stream of int16 mono samples queued for playback.
+
+    The producer calls `write()` as audio arrives and `finish()` at the end;
+    the output callback consumes it. `done` is set once the clip has been
+    played out (or cancelled), and `started_at` holds the perf_counter time
+    its first sample reached the device.
+    """
+
+    def __init__(self):
+        self._chunks = collections.deque()
+        self._offset = 0
+        self._callbacks = []
+        self.written = 0        # samples written (producer side)
+        self.played = 0         # samples played (callback side)
+        self.finished = False
+        self.cancelled = False
+        self.started_at = None
+        self.done = threading.Event()
+        self.source = None      # whatever fills the clip (e.g. an asyncio task), for cancellation
+
+    def write(self, pcm: np.ndarray):
+        if self.cancelled or not len(pcm):
+            return
+        self._chunks.append(pcm)
+        self.written += len(pcm)
+
+    def finish(self):
+        self.finished = True
+
+    def cancel(self):
+        # Only flag it: the output callback reads `_chunks` on the audio thread
+        # without a lock, so it is also the one that drops them.
+        self.cancelled = True
+        if self.source is not None:
+            self.source.cancel()
+
+    def add_done_callback(self, fn):
+        """Call `fn(clip)` once done (from the audio thread, or now if already done)."""
+        self._callbacks.append(fn)
+        if self.done.is_set():
+            self._run_callbacks()
+
+    async def wait(self):
+        """Wait for the clip to finish without blocking the event loop."""
+        if self.done.is_set():
+            return
+        loop = asyncio.get_running_loop()
+        finished = loop.create_future()
+
+        def wake(_):
+            loop.call_soon_threadsafe(lambda: finished.done() or finished.set_result(None))
+
+        self.add_done_callback(wake)
+        await finished
+
+    def _set_done(self):
+        self.done.set()
+        self._run_callbacks()
+
+    def _run_callbacks(self):
+        # list.pop is atomic, so each callback runs exactly once whichever thread gets it.
+        while True:
+            try:
+                fn = self._callbacks.pop()
+            except IndexError:
+                return
+            fn(self)
+
+    def _read_into(self, out: np.ndarray) -> int:
+        n = 0
+        while n < len(out) and self._chunks:
+            chunk = self._chunks[0]
+            take = min(len(out) - n, len(chunk) - self._offset)
+            out[n:n + take] = chunk[self._offset:self._offset + take]
+            n += take
+            self._offset += take
+            if self._offset == len(chunk):
+                self._chunks.popleft()
+                self._offset = 0
+        self.played += n
+        return n
+
+
+class AudioOutput:
+    """
+    Long-lived mono int16 output stream playing queued clips in order.
+
+    The stream is opened on first use and kept open, so there is no per-
+    utterance device setup. `underruns` counts callbacks where a started clip
+    ran dry before it was finished (network slower than playback);
+    `output_underflows` counts PortAudio's own underflow flags.
+    """
+
+    def __init__(self, samplerate: int = TARGET_RATE, block_ms: int = 20, jitter_ms: int = 60, device=None):
+        self.samplerate = samplerate
+        self.blocksize = samplerate * block_ms // 1000
+        self.jitter = samplerate * jitter_ms // 1000
+        self.device = device
+        self.clips = collections.deque()
+        self.underruns = 0
+        self.output_underflows = 0
+        self._stream = None
+        self._enqueued = 0
+        self._flush_upto = 0    # clips enqueued before this count were dropped by stop()
+
+    def start(self):
+        """Open the stream, or reopen it if PortAudio stopped it (callback error, device loss)."""
+        if self._stream is not None and not self._stream.active:
+            self._stream.close()
+            self._stream = None
+        if self._stream is None:
+            self._stream = sd.OutputStream(samplerate=self.samplerate, channels=1, dtype="int16",
+                                           blocksize=self.blocksize, latency="low", device=self.device,
+                                           callback=self._callback)
+            self._stream.start()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def clip(self) -> Clip:
+        """A new clip that is not queued yet (fill it, then `enqueue` it)."""
+        return Clip()
+
+    def enqueue(self, clip: Clip) -> Clip:
+        self.start()
+        clip.seq = self._enqueued
+        self._enqueued += 1
+        self.clips.append(clip)
+        return clip
+
+    def play(self, pcm: np.ndarray) -> Clip:
+        """Queue already-decoded PCM; returns the clip (`clip.done.wait()` to block)."""
+        clip = Clip()
+        clip.write(pcm)
+        clip.finish()
+        return self.enqueue(clip)
+
+    def stop(self):
+        """Drop everything queued or playing; takes effect within one block."""
+        for clip in list(self.clips):
+            clip.cancel()
+        self._flush_upto = self._enqueued
+
+    def _callback(self, outdata, frames, time_info, status):
+        if status.output_underflow:
+            self.output_underflows += 1
+        out = outdata[:, 0]
+        filled = 0
+        while filled < frames and self.clips:
+            clip = self.clips[0]
+            if clip.seq < self._flush_upto or clip.cancelled:
+                self.clips.popleft()
+                clip._chunks.clear()
+                clip._set_done()
+                continue
+            if not clip.played and not clip.finished and clip.written < self.jitter:
+                break  # still filling the jitter buffer
+            n = clip._read_into(out[filled:frames])
+            if n and clip.started_at is None:
+                clip.started_at = time.perf_counter()
+            filled += n
+            if clip.finished and clip.played >= clip.written:
+                self.clips.popleft()
+                clip._set_done()
+            elif not n:
+                self.underruns += 1
+                break
+        out[filled:] = 0
+
+    def stats(self) -> dict:
+        return {"queued": len(self.clips), "underruns": self.underruns,
+                "output_underflows": self.output_underflows}
+
+
+class WavStream:
+    """
+    Turn a WAV file arriving in arbitrary byte chunks into int16 samples.
+
+    Target-format (16 kHz mono 16-bit) bodies are passed through as they
+    arrive; anything else is buffered and converted once complete.
+    """
+
+    def __init__(self, samplerate: int = TARGET_RATE):
+        self.samplerate = samplerate
+        self._buf = bytearray()
+        self._streaming = None  # True once the header says target format
+
+    def feed(self, data: bytes) -> np.ndarray:
+        self._buf += data
+        if self._streaming is None:
+            try:
+                info = parse_wav_header(self._buf)
+            except ValueError:
+                if len(self._buf) < 4096:
+                    return np.zeros(0, dtype=np.int16)  # header not complete yet
+                self._streaming = False
+                return np.zeros(0, dtype=np.int16)
+            self._streaming = is_target_format(info, self.samplerate)
+            if self._streaming:
+                del self._buf[:info.data_offset]
+        if not self._streaming:
+            return np.zeros(0, dtype=np.int16)
+        usable = len(self._buf) & ~1
+        pcm = np.frombuffer(bytes(self._buf[:usable]), dtype="<i2")
+        del self._buf[:usable]
+        return pcm
+
+    def close(self) -> np.ndarray:
+        """Samples still pending at the end of the body."""
+        if self._streaming or not self._buf:
+            return np.zeros(0, dtype=np.int16)
+        return normalize_to_pcm16(bytes(self._buf), self.samplerate)
+
+
+def decode_tts_body(body: bytes, content_type: str, samplerate: int = TARGET_RATE) -> np.ndarray:
+    """
+    Decode a complete Hamsa TTS body (JSON with audioBase64, or WAV) to int16 samples.
+
+    Raises:
+        ValueError: If the body is JSON without audio or not a WAV file.
+    """
+    if "json" in content_type:
+        result = json.loads(body)
+        if "audioBase64" not in result:
+            raise ValueError(f"Unexpected JSON: {result}")
+        body = base64.b64decode(result["audioBase64"])
+    return normalize_to_pcm16(body, samplerate)
+
+
+def stream_to_clip(response, clip: Clip):
+    """Copy a streaming httpx TTS response into `clip` as bytes arrive, then finish it."""
+    try:
+        content_type = response.headers.get("content-type", "")
+        if "json" in content_type:
+            clip.write(decode_tts_body(response.read(), content_type))
+            return
+        decoder = WavStream()
+        for chunk in response.iter_bytes():
+            clip.write(decoder.feed(chunk))
+        clip.write(decoder.close())
+    finally:
+        clip.finish()
+
+
+async def astream_to_clip(response, clip: Clip):
+    """Async `stream_to_clip` for responses from an httpx.AsyncClient."""
+    try:
+        content_type = response.headers.get("content-type", "")
+        if "json" in content_type:
+            clip.write(decode_tts_body(await response.aread(), content_type))
+            return
+        decoder = WavStream()
+        async for chunk in response.aiter_bytes():
+            clip.write(decoder.feed(chunk))
+        clip.write(decoder.close())
+    finally:
+        clip.finish()
@@ -16,13 +16,13 @@ This Python script continuously records audio using the `sounddevice` library. I
     - The `pcm_frames_to_wav_bytes` function converts the recorded PCM audio frames into a WAV format and stores the audio in memory using `io.BytesIO`.
 
 3. **Audio Recording**:
-    - The `record_until_silence` function listens to the microphone input using `sounddevice.InputStream`.
-    - It uses the WebRTC VAD to detect speech. When the VAD detects no speech (silence), it increments a counter. If silence exceeds the threshold (`silence_ms`), the recording stops.
-    - The audio frames are combined, converted to WAV, and returned as a byte array.
+    - The `record_until_silence` function listens to the microphone input through `MicCapture` (`capture.py`).
+    - An `Endpointer` (`endpointer.py`) uses the WebRTC VAD to detect speech. Once silence after speech exceeds the threshold (`silence_ms`), the utterance is returned.
+    - The utterance is converted to WAV and returned as a byte array; capture overflow/underflow counters are printed.
 
 4. **Callback Function**:
-    - The callback function processes each audio frame, checks if the frame contains speech using VAD, and appends the frames to a list.
-    - If continuous silence is detected, the stream is stopped, and the audio is processed.
+    - The audio callback only copies each frame into a preallocated ring buffer.
+    - VAD and silence detection run on a separate consumer thread, so a busy host does not cause input overflows.
 
 5. **File Saving**:
     - The recorded audio is saved as `mic_test.wav` after the silence threshold is reached.
@@ -44,15 +44,17 @@ This Python script continuously records audio using the `sounddevice` library. I
 """
 
 
-import sounddevice as sd
 import wave
 import webrtcvad
 import numpy as np
 import io
+from capture import MicCapture
+from endpointer import Endpointer
 
 samplerate = 16000
 frame_ms = 10          # Frame size in ms (smaller frame size for quicker detection)
 silence_ms = 500      # Stop after ~1s of silence
+max_ms = 10000         # Longest recording kept
 vad = webrtcvad.Vad(1)  # Less aggressive for faster response (1 or 2 should work)
 
 # Function to convert PCM frames to WAV format in memory
@@ -70,41 +72,18 @@ def pcm_frames_to_wav_bytes(pcm_frames: np.ndarray, samplerate: int = 16000) ->
 def record_until_silence():
     print("🎙️ Listening... start speaking")
 
-    frame_size = int(samplerate * frame_ms / 1000)  # Samples per frame
-    audio_frames = []
-    continuous_silence_ms = 0
+    # Fixed hangover of `silence_ms`; VAD runs on MicCapture's consumer thread,
+    # the audio callback only copies frames into the ring buffer.
+    endpointer = Endpointer(vad, samplerate, frame_ms, max_utterance_ms=max_ms,
+                            min_hangover_ms=silence_ms, max_hangover_ms=silence_ms)
+    with MicCapture(endpointer) as mic:
+        audio = mic.next_utterance(timeout=max_ms / 1000)  # Safety cap (10s)
+    print("Capture health:", mic.stats())
 
-    def callback(indata, frames, time, status):
-        nonlocal audio_frames, continuous_silence_ms
-        if status:
-            print(status)
+    if audio is None:
+        print("No speech detected")
+        return None
 
-        pcm = indata[:, 0].copy()  # Mono audio channel
-        audio_frames.append(pcm)
-
-        # VAD expects bytes, so check if speech is detected
-        is_speech = vad.is_speech(pcm.tobytes(), samplerate)
-
-        if is_speech:
-            continuous_silence_ms = 0  # Reset silence counter when speech is detected
-        else:
-            continuous_silence_ms += frame_ms  # Increment silence duration
-
-        if continuous_silence_ms >= silence_ms and len(audio_frames) > int(silence_ms / frame_ms):
-            raise sd.CallbackStop()  # Stop stream if silence threshold is exceeded
-
-    try:
-        # Start the recording stream with specified parameters
-        with sd.InputStream(samplerate=samplerate, channels=1, dtype='int16',
-                            blocksize=frame_size, callback=callback):
-            sd.sleep(10000)  # Safety cap to ensure the stream stops after a max duration (10s)
-
-    except sd.CallbackStop:
-        pass  # The stream stopped due to silence detection
-
-    # Combine all frames into a single audio array
-    audio = np.concatenate(audio_frames, axis=0)
-    
     # Convert audio frames to WAV format in memory
     wav_bytes = pcm_frames_to_wav_bytes(audio, samplerate)
 